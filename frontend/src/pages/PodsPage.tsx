@@ -46,7 +46,7 @@ const PodsPage: React.FC = () => {
       });
 
       setPods(data.data);
-      setHasMore(data.skip + data.count < data.total);
+      setHasMore(data.has_more);
       setLastRefreshed(new Date());
     } catch (error) {
       if (!(error instanceof DOMException && error.name === 'AbortError')) {
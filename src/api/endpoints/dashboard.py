@@ -1,27 +1,67 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
 from pymongo import MongoClient
+from bson import ObjectId
+from bson.errors import InvalidId
+import base64
+import json
+import re
 import sys
+import threading
+import time
 from pathlib import Path
 
 # Adds /Users/amrithashyam/Desktop/guidewire/DT/ to sys.path
 sys.path.append(str(Path(__file__).resolve().parents[2]))
 
 from config import settings
-from datetime import timedelta
+from storage.rollup import (
+    ROLLUP_TIERS, LABEL_FIELD, bucket_start, floor_time, rolled_up_until, rollup_collection_name
+)
+from datetime import datetime, timedelta
+import numpy as np
 import pandas as pd
 
 router = APIRouter()
 
-client = MongoClient(settings.MONGO_URI)
+# tz_aware: timestamps are BSON dates in UTC and are returned with their offset
+client = MongoClient(settings.MONGO_URI, tz_aware=True)
 db = client[settings.MONGO_DB_NAME]
 
 pod_collection = db["pod_metrics"]
 node_collection = db["node_metrics"]
 deployment_collection = db["deployment_metrics"]
 
+# Exclude the time-series metaField, a copy of the identifying fields; _id is kept for the cursor
+PROJECTION = {"meta": 0}
+
+# Newest first; _id breaks ties between rows of the same cycle
+SORT = [("timestamp", -1), ("_id", -1)]
+
+# How the total is reported: "exact" counts on every request, "cached" serves an
+# exact count for DASHBOARD_COUNT_CACHE_SECONDS, "estimated" uses the collection
+# metadata (ignores filters) and "none" skips counting
+TOTAL_MODES = ("cached", "exact", "estimated", "none")
+_count_cache = {}
+_count_cache_lock = threading.Lock()
+
+# Chart aggregation: bucket sizes like 10s, 1m or 5m, the statistics that can be
+# requested and the metrics charted when none are given
+BUCKET_PATTERN = re.compile(r"^(\d+)(s|m|h)$")
+BUCKET_SECONDS = {"s": 1, "m": 60, "h": 3600}
+STATS = ("avg", "max", "p95")
+DEFAULT_POD_SERIES = ["cpu_usage", "memory_usage", "network_receive_bytes", "network_transmit_bytes", "restarts"]
+DEFAULT_NODE_SERIES = ["node_cpu_usage_percent", "node_memory_available_percent", "node_disk_utilization_ratio"]
+_server_version = None
+
+# Utility: Parse a query timestamp as UTC (naive values are taken to be UTC)
+def to_utc(value):
+    ts = pd.Timestamp(value)
+    ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+    return ts.to_pydatetime()
+
 # Utility: Build time filter
 def build_time_filter(time_range: str, start_time: str = None, end_time: str = None):
-    now = pd.Timestamp.utcnow()
+    now = pd.Timestamp.now(tz="UTC")
 
     windows = {
         "last_5m": now - timedelta(minutes=5),
@@ -32,20 +72,285 @@ def build_time_filter(time_range: str, start_time: str = None, end_time: str = N
         "last_3h": now - timedelta(hours=3),
         "last_6h": now - timedelta(hours=6),
         "last_1d": now - timedelta(days=1),
+        "last_7d": now - timedelta(days=7),
+        "last_30d": now - timedelta(days=30),
     }
 
     if time_range in windows:
-        return {"timestamp": {"$gte": windows[time_range].isoformat()}}
+        return {"timestamp": {"$gte": windows[time_range].to_pydatetime()}}
     elif time_range == "custom" and start_time and end_time:
         return {
             "timestamp": {
-                "$gte": pd.to_datetime(start_time).isoformat(),
-                "$lte": pd.to_datetime(end_time).isoformat()
+                "$gte": to_utc(start_time),
+                "$lte": to_utc(end_time)
             }
         }
     else:
         return {}
 
+# Utility: Opaque cursor of the last row of a page
+# Rows written before timestamps were stored as BSON dates hold strings, which
+# are kept verbatim and tagged so the next page compares them as strings
+def encode_cursor(doc):
+    timestamp = doc["timestamp"]
+    if isinstance(timestamp, datetime):
+        value, kind = timestamp.isoformat(), "date"
+    elif isinstance(timestamp, str):
+        value, kind = timestamp, "str"
+    else:
+        # Nothing to resume from; the client can still page with skip
+        return None
+    payload = json.dumps({"t": value, "k": kind, "id": str(doc["_id"])})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        kind = payload.get("k", "date")
+        if kind == "date":
+            timestamp = to_utc(payload["t"])
+        elif kind == "str" and isinstance(payload["t"], str):
+            timestamp = payload["t"]
+        else:
+            raise ValueError(kind)
+        return timestamp, ObjectId(payload["id"])
+    except (ValueError, KeyError, TypeError, AttributeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+# Utility: Count matching documents according to the requested total mode
+def count_total(collection, query, mode, cache_key):
+    if mode == "none":
+        return None
+    if mode == "estimated":
+        return collection.estimated_document_count()
+    if mode == "exact":
+        return collection.count_documents(query)
+
+    key = (collection.name, cache_key)
+    now = time.monotonic()
+    with _count_cache_lock:
+        cached = _count_cache.get(key)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    total = collection.count_documents(query)
+    with _count_cache_lock:
+        _count_cache[key] = (now + settings.DASHBOARD_COUNT_CACHE_SECONDS, total)
+        # Drop expired entries so unusual filter combinations do not pile up
+        for stale in [k for k, (expires, _) in _count_cache.items() if expires <= now]:
+            del _count_cache[stale]
+    return total
+
+# Utility: One page of rows, newest first, by cursor or (legacy) offset
+def list_page(collection, query, limit, skip, cursor, total_mode, cache_key):
+    if total_mode not in TOTAL_MODES:
+        raise HTTPException(status_code=400, detail=f"total must be one of {', '.join(TOTAL_MODES)}")
+    total = count_total(collection, query, total_mode, cache_key)
+
+    if cursor:
+        timestamp, last_id = decode_cursor(cursor)
+        after = [
+            {"timestamp": {"$lt": timestamp}},
+            {"timestamp": timestamp, "_id": {"$lt": last_id}},
+        ]
+        if isinstance(timestamp, datetime):
+            # Comparisons only match values of the same type, and string
+            # timestamps sort after every date in a descending sort
+            after.append({"timestamp": {"$type": "string"}})
+        query = {"$and": [query, {"$or": after}]}
+        skip = 0
+
+    # One extra row tells whether there is a next page without counting
+    rows = list(collection.find(query, PROJECTION).sort(SORT).skip(skip).limit(limit + 1))
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1]) if has_more else None
+    for row in rows:
+        del row["_id"]
+
+    return {
+        "status": "success",
+        "total": total,
+        "count": len(rows),
+        "limit": limit,
+        "skip": skip,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+        "data": rows
+    }
+
+# Utility: Parse a bucket size into seconds
+def parse_bucket(bucket: str):
+    match = BUCKET_PATTERN.match(bucket)
+    if not match or int(match.group(1)) == 0:
+        raise HTTPException(status_code=400, detail="bucket must look like 10s, 1m or 5m")
+    return int(match.group(1)) * BUCKET_SECONDS[match.group(2)]
+
+# Utility: Parse a comma-separated list of metric fields
+def parse_metrics(metrics: str, default):
+    names = [name.strip() for name in metrics.split(",") if name.strip()] if metrics else default
+    for name in names:
+        if name.startswith("$") or "." in name:
+            raise HTTPException(status_code=400, detail=f"Invalid metric name '{name}'")
+    return names
+
+# Utility: Parse the requested statistics
+def parse_stats(stats: str):
+    names = [name.strip() for name in stats.split(",") if name.strip()]
+    unknown = [name for name in names if name not in STATS]
+    if unknown or not names:
+        raise HTTPException(status_code=400, detail=f"stats must be a subset of {', '.join(STATS)}")
+    return names
+
+# Utility: MongoDB server version as a tuple, read once
+def server_version():
+    global _server_version
+    if _server_version is None:
+        _server_version = tuple(client.server_info().get("versionArray", [0]))
+    return _server_version
+
+# Utility: Coarsest rollup tier whose buckets fit evenly into the requested bucket
+def pick_tier(bucket_seconds):
+    tiers = [tier for tier, size in ROLLUP_TIERS.items() if bucket_seconds % size == 0]
+    return tiers[-1] if tiers else None
+
+# Utility: Per-bucket statistics and label counts, read from the coarsest rollup
+# tier that has the requested resolution and from the raw rows not rolled up yet
+def aggregate_series(source, query, bucket_seconds, metrics, stats):
+    time_range = query.get("timestamp", {})
+    start = time_range.get("$gte")
+    if start is None:
+        raise HTTPException(
+            status_code=400,
+            detail="Charts need a bounded range: a last_* time_range, or custom with start_time and end_time"
+        )
+    end = time_range.get("$lte") or pd.Timestamp.now(tz="UTC").to_pydatetime()
+    if (end - start).total_seconds() / bucket_seconds > settings.DASHBOARD_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"More than {settings.DASHBOARD_MAX_BUCKETS} buckets requested, use a larger bucket"
+        )
+
+    tier = pick_tier(bucket_seconds)
+    until = rolled_up_until(db, source, tier) if tier else None
+    if until is None:
+        return aggregate_buckets(db[source], query, bucket_seconds, metrics, stats), "raw"
+
+    # Whole requested buckets come from the tier, the rest from the raw rows
+    split = floor_time(until, bucket_seconds)
+    points = []
+    if start < split:
+        # Tier documents carry their bucket start: the one holding start would
+        # fall below an unaligned lower bound and the first point would be lost
+        tier_start = floor_time(start, ROLLUP_TIERS[tier])
+        tier_query = {**query, "timestamp": {**time_range, "$gte": tier_start, "$lt": split}}
+        points += aggregate_buckets(
+            db[rollup_collection_name(source, tier)], tier_query, bucket_seconds, metrics, stats, rollup=True
+        )
+    if end >= split:
+        raw_query = {**query, "timestamp": {**time_range, "$gte": max(start, split)}}
+        points += aggregate_buckets(db[source], raw_query, bucket_seconds, metrics, stats)
+    return points[-settings.DASHBOARD_MAX_BUCKETS:], tier
+
+# Utility: Group raw rows or rollup documents into buckets with MongoDB.
+# Rollup buckets are combined exactly for avg and max; their p95 is the
+# highest p95 of the combined buckets, an upper bound of the true value
+def aggregate_buckets(collection, query, bucket_seconds, metrics, stats, rollup=False):
+    bucket = bucket_start(bucket_seconds)
+
+    # $percentile needs MongoDB 7.0; older servers get p95 from a sample of the values
+    sampled_p95 = "p95" in stats and not rollup and server_version() < (7, 0)
+    group = {"_id": bucket, "count": {"$sum": "$count" if rollup else 1}}
+    for i, metric in enumerate(metrics):
+        field = f"$metrics.{metric}" if rollup else f"${metric}"
+        if "avg" in stats and rollup:
+            group[f"sum_{i}"] = {"$sum": f"{field}.sum"}
+            group[f"n_{i}"] = {"$sum": f"{field}.n"}
+        elif "avg" in stats:
+            group[f"avg_{i}"] = {"$avg": field}
+        if "max" in stats:
+            group[f"max_{i}"] = {"$max": f"{field}.max" if rollup else field}
+        if "p95" in stats and rollup:
+            group[f"p95_{i}"] = {"$max": f"{field}.p95"}
+        elif "p95" in stats and not sampled_p95:
+            group[f"p95_{i}"] = {"$percentile": {"input": field, "p": [0.95], "method": "approximate"}}
+
+    if rollup:
+        labels_pipeline = [
+            {"$match": query},
+            {"$project": {"timestamp": 1, "labels": {"$objectToArray": "$labels"}}},
+            {"$unwind": "$labels"},
+            {"$group": {"_id": {"bucket": bucket, "label": "$labels.k"}, "count": {"$sum": "$labels.v"}}},
+        ]
+    else:
+        labels_pipeline = [
+            {"$match": query},
+            {"$group": {"_id": {"bucket": bucket, "label": f"${LABEL_FIELD}"}, "count": {"$sum": 1}}},
+        ]
+
+    # Newest buckets first, so the limit drops the oldest ones, then back in time order
+    rows = list(collection.aggregate([
+        {"$match": query},
+        {"$group": group},
+        {"$sort": {"_id": -1}},
+        {"$limit": settings.DASHBOARD_MAX_BUCKETS},
+    ], allowDiskUse=True))
+    rows.reverse()
+
+    labels = {}
+    for row in collection.aggregate(labels_pipeline, allowDiskUse=True):
+        label = row["_id"].get("label")
+        if label is not None:
+            labels.setdefault(row["_id"]["bucket"], {})[str(label)] = row["count"]
+
+    sampled = sample_percentiles(collection, query, bucket, bucket_seconds, metrics) if sampled_p95 and rows else {}
+
+    points = []
+    for row in rows:
+        values = {}
+        for i, metric in enumerate(metrics):
+            values[metric] = {stat: row.get(f"{stat}_{i}") for stat in stats}
+            if "avg" in stats and rollup:
+                values[metric]["avg"] = row[f"sum_{i}"] / row[f"n_{i}"] if row[f"n_{i}"] else None
+            if sampled_p95:
+                values[metric]["p95"] = sampled.get(row["_id"], {}).get(metric)
+            elif "p95" in stats and not rollup:
+                p95 = row.get(f"p95_{i}")
+                values[metric]["p95"] = p95[0] if p95 else None
+        points.append({
+            "timestamp": row["_id"],
+            "count": row["count"],
+            "metrics": values,
+            "labels": labels.get(row["_id"], {}),
+        })
+    return points
+
+# Utility: p95 per bucket computed here on servers without $percentile. Each
+# bucket contributes at most DASHBOARD_P95_SAMPLE_VALUES values: buckets with
+# more rows are sampled on their own, so sparse buckets keep all their values
+# and every bucket document stays far below the 16 MB BSON limit
+def sample_percentiles(collection, query, bucket, bucket_seconds, metrics):
+    sample_rows = max(1, settings.DASHBOARD_P95_SAMPLE_VALUES // len(metrics))
+    group = {"_id": bucket}
+    for i, metric in enumerate(metrics):
+        group[f"values_{i}"] = {"$push": f"${metric}"}
+
+    counts = collection.aggregate([{"$match": query}, {"$group": {"_id": bucket, "count": {"$sum": 1}}}], allowDiskUse=True)
+    windows = [
+        {"timestamp": {"$gte": row["_id"], "$lt": row["_id"] + timedelta(seconds=bucket_seconds)}}
+        for row in counts if row["count"] > sample_rows
+    ]
+    pipelines = [[{"$match": {"$and": [query, {"$nor": windows}]} if windows else query}, {"$group": group}]]
+    for window in windows:
+        pipelines.append([{"$match": {"$and": [query, window]}}, {"$sample": {"size": sample_rows}}, {"$group": group}])
+
+    percentiles = {}
+    for pipeline in pipelines:
+        for row in collection.aggregate(pipeline, allowDiskUse=True):
+            for i, metric in enumerate(metrics):
+                numbers = [value for value in row[f"values_{i}"] if isinstance(value, (int, float))]
+                percentiles.setdefault(row["_id"], {})[metric] = float(np.percentile(numbers, 95)) if numbers else None
+    return percentiles
+
 # --- POD Metrics ---
 @router.get("/pods")
 def get_pod_metrics(
@@ -55,29 +360,18 @@ def get_pod_metrics(
     namespace: str = Query(None),
     pod_name: str = Query(None),
     limit: int = Query(100, gt=0),
-    skip: int = Query(0, ge=0)
+    skip: int = Query(0, ge=0),
+    cursor: str = Query(None),
+    total: str = Query("cached")
 ):
     query = build_time_filter(time_range, start_time, end_time)
     if namespace:
-        query["namespace"] = namespace
+        query["meta.namespace"] = namespace
     if pod_name:
-        query["pod"] = pod_name
-
-    total = pod_collection.count_documents(query)
-    data = list(
-        pod_collection.find(query, {"_id": 0})
-        .sort("timestamp", -1)
-        .skip(skip)
-        .limit(limit)
-    )
-    return {
-        "status": "success",
-        "total": total,
-        "count": len(data),
-        "limit": limit,
-        "skip": skip,
-        "data": data
-    }
+        query["meta.pod"] = pod_name
+
+    cache_key = (time_range, start_time, end_time, namespace, pod_name)
+    return list_page(pod_collection, query, limit, skip, cursor, total, cache_key)
 
 # --- NODE Metrics ---
 @router.get("/nodes")
@@ -87,27 +381,16 @@ def get_node_metrics(
     end_time: str = Query(None),
     node_name: str = Query(None),
     limit: int = Query(100, gt=0),
-    skip: int = Query(0, ge=0)
+    skip: int = Query(0, ge=0),
+    cursor: str = Query(None),
+    total: str = Query("cached")
 ):
     query = build_time_filter(time_range, start_time, end_time)
     if node_name:
-        query["node_name"] = node_name
-
-    total = node_collection.count_documents(query)
-    data = list(
-        node_collection.find(query, {"_id": 0})
-        .sort("timestamp", -1)
-        .skip(skip)
-        .limit(limit)
-    )
-    return {
-        "status": "success",
-        "total": total,
-        "count": len(data),
-        "limit": limit,
-        "skip": skip,
-        "data": data
-    }
+        query["meta.node_name"] = node_name
+
+    cache_key = (time_range, start_time, end_time, node_name)
+    return list_page(node_collection, query, limit, skip, cursor, total, cache_key)
 
 # --- DEPLOYMENT Metrics ---
 @router.get("/deployments")
@@ -118,26 +401,59 @@ def get_deployment_metrics(
     namespace: str = Query(None),
     deployment_name: str = Query(None),
     limit: int = Query(100, gt=0),
-    skip: int = Query(0, ge=0)
+    skip: int = Query(0, ge=0),
+    cursor: str = Query(None),
+    total: str = Query("cached")
 ):
     query = build_time_filter(time_range, start_time, end_time)
     if namespace:
-        query["namespace"] = namespace
+        query["meta.namespace"] = namespace
     if deployment_name:
-        query["deployment"] = deployment_name
-
-    total = deployment_collection.count_documents(query)
-    data = list(
-        deployment_collection.find(query, {"_id": 0})
-        .sort("timestamp", -1)
-        .skip(skip)
-        .limit(limit)
+        query["meta.deployment"] = deployment_name
+
+    cache_key = (time_range, start_time, end_time, namespace, deployment_name)
+    return list_page(deployment_collection, query, limit, skip, cursor, total, cache_key)
+
+# --- Chart Aggregations ---
+@router.get("/pods/aggregate")
+def get_pod_aggregates(
+    time_range: str = Query("last_1h"),
+    start_time: str = Query(None),
+    end_time: str = Query(None),
+    namespace: str = Query(None),
+    pod_name: str = Query(None),
+    bucket: str = Query("1m"),
+    metrics: str = Query(None, description="Comma-separated metric fields"),
+    stats: str = Query("avg,max,p95")
+):
+    query = build_time_filter(time_range, start_time, end_time)
+    if namespace:
+        query["meta.namespace"] = namespace
+    if pod_name:
+        query["meta.pod"] = pod_name
+
+    stat_names = parse_stats(stats)
+    points, resolution = aggregate_series(
+        "pod_metrics", query, parse_bucket(bucket), parse_metrics(metrics, DEFAULT_POD_SERIES), stat_names
     )
-    return {
-        "status": "success",
-        "total": total,
-        "count": len(data),
-        "limit": limit,
-        "skip": skip,
-        "data": data
-    }
+    return {"status": "success", "bucket": bucket, "resolution": resolution, "count": len(points), "data": points}
+
+@router.get("/nodes/aggregate")
+def get_node_aggregates(
+    time_range: str = Query("last_1h"),
+    start_time: str = Query(None),
+    end_time: str = Query(None),
+    node_name: str = Query(None),
+    bucket: str = Query("1m"),
+    metrics: str = Query(None, description="Comma-separated metric fields"),
+    stats: str = Query("avg,max,p95")
+):
+    query = build_time_filter(time_range, start_time, end_time)
+    if node_name:
+        query["meta.node_name"] = node_name
+
+    stat_names = parse_stats(stats)
+    points, resolution = aggregate_series(
+        "node_metrics", query, parse_bucket(bucket), parse_metrics(metrics, DEFAULT_NODE_SERIES), stat_names
+    )
+    return {"status": "success", "bucket": bucket, "resolution": resolution, "count": len(points), "data": points}
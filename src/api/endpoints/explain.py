@@ -1,11 +1,14 @@
 
 from fastapi import APIRouter, HTTPException
+import asyncio
 import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
 
 from llm.gemini_explainer import explain_pod_prediction, explain_node_prediction
+from llm.gemini_client import LLMBusyError
+from config.settings import LLM_TIMEOUT
 from api.schemas.shared import ExplainRequest, NodeExplainRequest  
 
 router = APIRouter()
@@ -13,15 +16,23 @@ router = APIRouter()
 @router.post("/pod")
 async def explain(data: ExplainRequest):
     try:
-        explanation = explain_pod_prediction(data.model_dump())
+        explanation = await explain_pod_prediction(data.model_dump())
         return {"explanation": explanation}
+    except LLMBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"No answer from Gemini within {LLM_TIMEOUT}s")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/node")
 async def explain_node(data: NodeExplainRequest):
     try:
-        explanation = explain_node_prediction(data.model_dump())
+        explanation = await explain_node_prediction(data.model_dump())
         return {"explanation": explanation}
+    except LLMBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"No answer from Gemini within {LLM_TIMEOUT}s")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
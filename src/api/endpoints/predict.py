@@ -0,0 +1,27 @@
+from typing import List, Dict, Any
+from fastapi import APIRouter, HTTPException
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")))
+
+from predictor.predictor import predict_pods_batch, predict_nodes_batch
+
+router = APIRouter()
+
+# Sync handlers: FastAPI runs them in its thread pool, so inference does not block the event loop.
+# With INFERENCE_SOCKET set they use the shared inference service instead of loading the models here.
+
+@router.post("/pods")
+def predict_pods(docs: List[Dict[str, Any]]):
+    results = predict_pods_batch(docs)
+    if results and all("error" in result for result in results):
+        raise HTTPException(status_code=500, detail=results[0]["error"])
+    return {"predictions": results}
+
+@router.post("/nodes")
+def predict_nodes(docs: List[Dict[str, Any]]):
+    results = predict_nodes_batch(docs)
+    if results and all("error" in result for result in results):
+        raise HTTPException(status_code=500, detail=results[0]["error"])
+    return {"predictions": results}
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException
+import asyncio
 import sys
 import os
 import traceback
@@ -12,6 +13,8 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "../..")
 
 # Import your remediator functions and schema models
 from llm.gemini_remediator import remediate_pod_prediction, remediate_node_prediction
+from llm.gemini_client import LLMBusyError
+from config.settings import LLM_TIMEOUT
 from api.schemas.shared import ExplainRequest, NodeExplainRequest
 
 # Import the Mongo exporter
@@ -25,7 +28,7 @@ exporter = MongoExporter()  # Initialize once
 @router.post("/pod")
 async def remediate_pod(data: ExplainRequest):
     try:
-        remediation = remediate_pod_prediction(data.dict())  # Assuming this function generates the remediation command
+        remediation = await remediate_pod_prediction(data.dict())  # Assuming this function generates the remediation command
 
         remediation_doc = {
             "remediation_id": str(uuid.uuid4()),
@@ -38,10 +41,14 @@ async def remediate_pod(data: ExplainRequest):
             "applied_at": None
         }
 
-        # Save the initial remediation document
-        exporter.save_to_mongo([remediation_doc], "remediations")
+        # Save the initial remediation document (off the event loop)
+        await asyncio.to_thread(exporter.save_to_mongo, [remediation_doc], "remediations")
         return {"remediation_id": remediation_doc["remediation_id"], "remediation": remediation}
 
+    except LLMBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"No answer from Gemini within {LLM_TIMEOUT}s")
     except Exception as e:
         error_details = traceback.format_exc()
         print(f"[ERROR - /pod] {error_details}")
@@ -55,7 +62,7 @@ async def remediate_node(data: NodeExplainRequest):
     try:
         print(f"Received data: {data}")
 
-        remediation = remediate_node_prediction(data.model_dump())  # Assuming this function generates the remediation command
+        remediation = await remediate_node_prediction(data.model_dump())  # Assuming this function generates the remediation command
 
         remediation_doc = {
             "remediation_id": str(uuid.uuid4()),
@@ -68,10 +75,14 @@ async def remediate_node(data: NodeExplainRequest):
             "applied_at": None
         }
 
-        # Save the initial remediation document
-        exporter.save_to_mongo([remediation_doc], "remediations")
+        # Save the initial remediation document (off the event loop)
+        await asyncio.to_thread(exporter.save_to_mongo, [remediation_doc], "remediations")
         return {"remediation_id": remediation_doc["remediation_id"], "remediation": remediation}
 
+    except LLMBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail=f"No answer from Gemini within {LLM_TIMEOUT}s")
     except Exception as e:
         error_details = traceback.format_exc()
         print(f"[ERROR - /node] {error_details}")
@@ -0,0 +1,185 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+import asyncio
+import json
+from datetime import timedelta
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+
+from config import settings
+from .dashboard import db, PROJECTION
+import pandas as pd
+
+router = APIRouter()
+
+# Kinds a client can subscribe to and the collection each is read from
+STREAM_SOURCES = {
+    "pods": "pod_metrics",
+    "nodes": "node_metrics",
+}
+
+# Seconds between keep-alive comments, so proxies do not close idle streams
+HEARTBEAT_SECONDS = 15
+
+
+class Subscription:
+    """
+    One connected client: the kinds and filters it asked for and the cycles
+    waiting to be sent to it.
+    """
+
+    def __init__(self, kinds, namespace=None, label=None, queue_size=settings.STREAM_QUEUE_SIZE):
+        self.kinds = kinds
+        self.namespace = namespace
+        self.label = label
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def select(self, kind, rows):
+        if kind not in self.kinds:
+            return []
+        # Nodes belong to no namespace and are only filtered by label
+        namespace = self.namespace if kind == "pods" else None
+        return [
+            row for row in rows
+            if (namespace is None or row.get("namespace") == namespace)
+            and (self.label is None or str(row.get("predicted_label", "")).lower() == self.label.lower())
+        ]
+
+    def offer(self, event):
+        """Queue an event; a client that fell behind loses its oldest one."""
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class PredictionBroker:
+    """
+    Fans out each new cycle of predictions to every subscribed client.
+
+    A single reader follows the metrics collections while at least one client
+    is connected, so N open dashboards cost one query per collection and
+    polling interval instead of N. Anything else running in the API process
+    can hand rows to publish() directly.
+
+    Args:
+        interval (float): Seconds between two reads of the collections
+    """
+
+    def __init__(self, interval=settings.POLLING_INTERVAL):
+        self.interval = interval
+        self._subscribers = set()
+        self._reader = None
+        # Per collection: newest timestamp sent and the timestamp of every _id
+        # sent within STREAM_LOOKBACK of it
+        self._positions = {}
+        self._started = None
+
+    def subscribe(self, kinds, namespace=None, label=None):
+        subscription = Subscription(kinds, namespace, label)
+        self._subscribers.add(subscription)
+        if self._reader is None or self._reader.done():
+            self._reader = asyncio.get_running_loop().create_task(self._follow())
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, kind, rows):
+        """
+        Send rows of one kind ("pods" or "nodes") to the subscribers whose filters match.
+        """
+        for subscription in list(self._subscribers):
+            selected = subscription.select(kind, rows)
+            if selected:
+                subscription.offer((kind, selected))
+
+    async def _follow(self):
+        now = pd.Timestamp.now(tz="UTC").to_pydatetime()
+        self._started = now
+        self._positions = {collection_name: (now, {}) for collection_name in STREAM_SOURCES.values()}
+        while self._subscribers:
+            for kind, collection_name in STREAM_SOURCES.items():
+                try:
+                    rows = await asyncio.to_thread(self._read_new, collection_name)
+                except Exception as e:
+                    print(f"Error reading new rows from '{collection_name}': {e}")
+                    continue
+                if rows:
+                    self.publish(kind, rows)
+            await asyncio.sleep(self.interval)
+        self._reader = None
+
+    def _read_new(self, collection_name):
+        """
+        Rows written since the last read. Writes are unordered and may be
+        retried, so rows of an older cycle can become visible after newer
+        ones: the last STREAM_LOOKBACK seconds before the newest row sent are
+        read again and the rows already sent are skipped.
+        """
+        newest, sent = self._positions[collection_name]
+        lookback = timedelta(seconds=settings.STREAM_LOOKBACK)
+        # Clients only get cycles written after they connected
+        since = max(newest - lookback, self._started)
+        cursor = db[collection_name].find(
+            {"timestamp": {"$gte": since}, "_id": {"$nin": list(sent)}}, PROJECTION
+        ).sort([("timestamp", 1), ("_id", 1)]).limit(settings.STREAM_MAX_ROWS)
+
+        rows = list(cursor)
+        for row in rows:
+            sent[row["_id"]] = row["timestamp"]
+            del row["_id"]
+        if rows:
+            newest = max(newest, rows[-1]["timestamp"])
+            sent = {_id: timestamp for _id, timestamp in sent.items() if timestamp >= newest - lookback}
+        self._positions[collection_name] = (newest, sent)
+        return rows
+
+
+broker = PredictionBroker()
+
+
+async def event_stream(request, subscription):
+    try:
+        while not await request.is_disconnected():
+            try:
+                kind, rows = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            payload = json.dumps(jsonable_encoder({"count": len(rows), "dropped": subscription.dropped, "data": rows}))
+            yield f"event: {kind}\ndata: {payload}\n\n"
+    finally:
+        broker.unsubscribe(subscription)
+
+
+# --- Live Predictions ---
+@router.get("/predictions")
+async def stream_predictions(
+    request: Request,
+    kinds: str = Query("pods,nodes", description="Comma-separated: pods, nodes"),
+    namespace: str = Query(None),
+    label: str = Query(None, description="Only rows with this predicted label")
+):
+    """
+    Server-Sent Events stream of the rows of every new collection cycle.
+
+    Each event is named after its kind ("pods" or "nodes") and carries
+    {"count", "dropped", "data"}; "dropped" counts the events this client
+    missed because it read too slowly.
+    """
+    selected = {kind.strip() for kind in kinds.split(",") if kind.strip()}
+    unknown = selected - set(STREAM_SOURCES)
+    if unknown or not selected:
+        raise HTTPException(status_code=400, detail=f"kinds must be a subset of {', '.join(STREAM_SOURCES)}")
+
+    subscription = broker.subscribe(selected, namespace, label)
+    return StreamingResponse(
+        event_stream(request, subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -1,6 +1,6 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .endpoints import explain, dashboard, remediate  
+from .endpoints import explain, dashboard, remediate, predict, stream
 
 app = FastAPI(title="K8s Monitoring API")
 
@@ -17,3 +17,5 @@ app.add_middleware(
 app.include_router(explain.router, prefix="/explain", tags=["LLM Remediation"])
 app.include_router(remediate.router, prefix="/remediate", tags=["LLM Remediation"])  
 app.include_router(dashboard.router, prefix="/dashboard", tags=["Dashboard Data"])
+app.include_router(predict.router, prefix="/predict", tags=["Predictions"])
+app.include_router(stream.router, prefix="/stream", tags=["Live Predictions"])
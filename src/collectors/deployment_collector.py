@@ -2,10 +2,26 @@
 Collector for deployment metrics.
 """
 
-from core.prometheus import get_metric_value
+from core.prometheus import get_metric_values
 from config.settings import DEPLOYMENT_QUERIES
 
 
+def build_deployment_queries(deployment_name):
+    """
+    Substitute a deployment name into every DEPLOYMENT_QUERIES template.
+    
+    Args:
+        deployment_name (str): Name of the deployment
+        
+    Returns:
+        dict: Dictionary mapping metric names to PromQL queries
+    """
+    return {
+        metric_name: query_template.replace("{deployment}", deployment_name)
+        for metric_name, query_template in DEPLOYMENT_QUERIES.items()
+    }
+
+
 def collect_deployment_metrics(deployment_name, namespace):
     """
     Collect metrics for a specific deployment.
@@ -21,17 +37,14 @@ def collect_deployment_metrics(deployment_name, namespace):
         "namespace": namespace,
         "deployment": deployment_name
     }
-    
-    for metric_name, query_template in DEPLOYMENT_QUERIES.items():
-        query = query_template.replace("{deployment}", deployment_name)
-        deployment_metrics[metric_name] = get_metric_value(query)
+    deployment_metrics.update(get_metric_values(build_deployment_queries(deployment_name)))
         
     return deployment_metrics
 
 
 def collect_all_deployments_metrics(deployments):
     """
-    Collect metrics for all deployments.
+    Collect metrics for all deployments, fanning out every query at once.
     
     Args:
         deployments (list): List of tuples (namespace, deployment_name)
@@ -39,10 +52,23 @@ def collect_all_deployments_metrics(deployments):
     Returns:
         dict: Dictionary mapping deployment identifiers to their metrics
     """
+    queries = {}
+    for namespace, deployment_name in deployments:
+        deployment_key = f"{namespace}/{deployment_name}"
+        for metric_name, query in build_deployment_queries(deployment_name).items():
+            queries[(deployment_key, metric_name)] = query
+    values = get_metric_values(queries)
+    
     deployment_data = {}
     
     for namespace, deployment_name in deployments:
         deployment_key = f"{namespace}/{deployment_name}"
-        deployment_data[deployment_key] = collect_deployment_metrics(deployment_name, namespace)
+        deployment_metrics = {
+            "namespace": namespace,
+            "deployment": deployment_name
+        }
+        for metric_name in DEPLOYMENT_QUERIES:
+            deployment_metrics[metric_name] = values[(deployment_key, metric_name)]
+        deployment_data[deployment_key] = deployment_metrics
         
-    return deployment_data
\ No newline at end of file
+    return deployment_data
@@ -2,13 +2,11 @@
 Collector for node metrics.
 """
 
-from core.prometheus import get_metric_value
-from config.settings import NODE_QUERIES
+from core.k8s_client import get_node_address
+from core.prometheus import get_metric_values, run_promql_queries, first_value, vector_values
+from config.settings import NODE_QUERIES, NODE_BATCH_QUERIES, NODE_ABSENT_VALUES, NODE_INFO_QUERY, COLLECTION_MODE
 
 
-
-import subprocess
-
 def get_node_ip(node_name):
     """
     Get the IP address of a node by its name.
@@ -19,59 +17,144 @@ def get_node_ip(node_name):
     Returns:
         str: IP address of the node
     """
-    try:
-        # Get the node's InternalIP using kubectl
-        ip_address = subprocess.check_output(
-            ["kubectl", "get", "node", node_name, "-o", "jsonpath={.status.addresses[?(@.type==\"InternalIP\")].address}"]
-        ).decode("utf-8").strip()
-        return ip_address
-    except subprocess.CalledProcessError as e:
-        print(f"Error fetching IP for node {node_name}: {e}")
-        return None
-
+    ip_address = get_node_address(node_name)
+    if ip_address is None:
+        print(f"Error fetching IP for node {node_name}: no InternalIP address")
+    return ip_address
 
 
-def collect_node_metrics(node_name):
+def build_node_queries(node_name):
     """
-    Collect metrics for a specific node.
+    Substitute a node's name and instance into every NODE_QUERIES template.
 
     Args:
         node_name (str): Name of the node
 
     Returns:
-        dict: Dictionary of node metrics
+        dict: Dictionary mapping metric names to PromQL queries, or None if the
+        node IP is unknown
     """
-    node_metrics = { "node_name": node_name }
-
     # Get node's internal IP
     node_ip = get_node_ip(node_name)
     if node_ip is None:
-        return {"error": "Unable to fetch node IP"}
+        return None
 
     # Add :9100 for instance-based metrics
     instance_with_port = f"{node_ip}:9100"
 
     # Replace {node} with node name and {instance} with node IP:port in the queries
-    for metric_name, query_template in NODE_QUERIES.items():
-        query = query_template.replace("{node}", node_name).replace("{instance}", instance_with_port)
-        node_metrics[metric_name] = get_metric_value(query)
+    return {
+        metric_name: query_template.replace("{node}", node_name).replace("{instance}", instance_with_port)
+        for metric_name, query_template in NODE_QUERIES.items()
+    }
+
+
+def collect_node_metrics(node_name):
+    """
+    Collect metrics for a specific node.
+
+    Args:
+        node_name (str): Name of the node
+
+    Returns:
+        dict: Dictionary of node metrics
+    """
+    queries = build_node_queries(node_name)
+    if queries is None:
+        return {"error": "Unable to fetch node IP"}
+
+    node_metrics = { "node_name": node_name }
+    node_metrics.update(get_metric_values(queries))
 
     return node_metrics
 
 
+def get_instance_nodes(results):
+    """
+    Map node-exporter instances to node names from a single kube_node_info lookup.
+    
+    Args:
+        results (list): Results of NODE_INFO_QUERY
+    
+    Returns:
+        dict: Dictionary mapping instance hosts (IP without port) to node names
+    """
+    node_info = vector_values(results, ("node", "internal_ip"))
+    return {internal_ip: node for node, internal_ip in node_info if node and internal_ip}
+
+
+def collect_all_nodes_metrics_batched(nodes):
+    """
+    Collect metrics for all nodes with one grouped query per metric.
+    
+    Node-keyed results are looked up directly, instance-keyed results are joined
+    to nodes through get_instance_nodes, and cluster-global values are queried
+    once and shared by every node.
+    
+    Args:
+        nodes (list): List of node names
+        
+    Returns:
+        dict: Dictionary mapping node names to their metrics
+    """
+    node_data = {node: {"node_name": node} for node in nodes}
+    queries = {metric_name: query for metric_name, (_, query) in NODE_BATCH_QUERIES.items()}
+    queries[NODE_INFO_QUERY] = NODE_INFO_QUERY
+    results = run_promql_queries(queries)
+    instance_nodes = get_instance_nodes(results[NODE_INFO_QUERY])
+    
+    for metric_name, (group_by, _) in NODE_BATCH_QUERIES.items():
+        default = NODE_ABSENT_VALUES[metric_name]
+        
+        if group_by is None:
+            values = dict.fromkeys(nodes, first_value(results[metric_name], default))
+        elif group_by == "instance":
+            values = {}
+            for (instance,), value in vector_values(results[metric_name], ("instance",)).items():
+                node = instance_nodes.get((instance or "").rsplit(":", 1)[0])
+                if node is not None:
+                    values.setdefault(node, value)
+        else:
+            values = {node: value for (node,), value in vector_values(results[metric_name], (group_by,)).items()}
+        
+        for node, node_metrics in node_data.items():
+            node_metrics[metric_name] = values.get(node, default)
+    
+    return node_data
+
+
 def collect_all_nodes_metrics(nodes):
     """
     Collect metrics for all nodes.
     
+    In per-object mode every node's queries are still fanned out together.
+    
     Args:
         nodes (list): List of node names
         
     Returns:
         dict: Dictionary mapping node names to their metrics
     """
+    if COLLECTION_MODE == "batched":
+        return collect_all_nodes_metrics_batched(nodes)
+    
+    node_queries = {node: build_node_queries(node) for node in nodes}
+    queries = {
+        (node, metric_name): query
+        for node, metric_queries in node_queries.items() if metric_queries is not None
+        for metric_name, query in metric_queries.items()
+    }
+    values = get_metric_values(queries)
+    
     node_data = {}
     
-    for node in nodes:
-        node_data[node] = collect_node_metrics(node)
+    for node, metric_queries in node_queries.items():
+        if metric_queries is None:
+            node_data[node] = {"error": "Unable to fetch node IP"}
+            continue
+        node_metrics = { "node_name": node }
+        for metric_name in metric_queries:
+            node_metrics[metric_name] = values[(node, metric_name)]
+        node_data[node] = node_metrics
         
-    return node_data
\ No newline at end of file
+    return node_data
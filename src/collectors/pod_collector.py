@@ -2,8 +2,24 @@
 Collector for pod metrics.
 """
 
-from core.prometheus import get_metric_value
-from config.settings import POD_QUERIES
+from core.prometheus import get_metric_values, run_promql_queries, vector_values
+from config.settings import POD_QUERIES, POD_BATCH_QUERIES, POD_ABSENT_VALUES, COLLECTION_MODE
+
+
+def build_pod_queries(pod_name):
+    """
+    Substitute a pod name into every POD_QUERIES template.
+    
+    Args:
+        pod_name (str): Name of the pod
+        
+    Returns:
+        dict: Dictionary mapping metric names to PromQL queries
+    """
+    return {
+        metric_name: query_template.replace("{pod}", pod_name)
+        for metric_name, query_template in POD_QUERIES.items()
+    }
 
 
 def collect_pod_metrics(pod_name, namespace, node_name):
@@ -23,28 +39,78 @@ def collect_pod_metrics(pod_name, namespace, node_name):
         "pod": pod_name,
         "node": node_name
     }
-    
-    for metric_name, query_template in POD_QUERIES.items():
-        query = query_template.replace("{pod}", pod_name)
-        pod_metrics[metric_name] = get_metric_value(query)
+    pod_metrics.update(get_metric_values(build_pod_queries(pod_name)))
         
     return pod_metrics
 
 
+def collect_all_pods_metrics_batched(pods):
+    """
+    Collect metrics for all pods with one grouped query per metric.
+    
+    Each POD_BATCH_QUERIES entry returns a vector grouped by (namespace, pod),
+    which is split back into per-pod dictionaries. Pods missing from a vector
+    get the value their POD_QUERIES template would have returned on its own.
+    
+    Args:
+        pods (list): List of tuples (namespace, pod_name, node_name)
+        
+    Returns:
+        dict: Dictionary mapping pod identifiers to their metrics
+    """
+    pod_data = {
+        f"{namespace}/{pod_name}": {
+            "namespace": namespace,
+            "pod": pod_name,
+            "node": node_name
+        }
+        for namespace, pod_name, node_name in pods
+    }
+    results = run_promql_queries({metric_name: POD_BATCH_QUERIES[metric_name] for metric_name in POD_QUERIES})
+    
+    for metric_name in POD_QUERIES:
+        default = POD_ABSENT_VALUES[metric_name]
+        values = vector_values(results[metric_name], ("namespace", "pod"))
+        for pod_metrics in pod_data.values():
+            key = (pod_metrics["namespace"], pod_metrics["pod"])
+            pod_metrics[metric_name] = values.get(key, default)
+        
+    return pod_data
+
+
 def collect_all_pods_metrics(pods):
     """
     Collect metrics for all pods.
     
+    In per-object mode every pod's queries are still fanned out together.
+    
     Args:
         pods (list): List of tuples (namespace, pod_name, node_name)
         
     Returns:
         dict: Dictionary mapping pod identifiers to their metrics
     """
+    if COLLECTION_MODE == "batched":
+        return collect_all_pods_metrics_batched(pods)
+    
+    queries = {}
+    for namespace, pod_name, node_name in pods:
+        pod_key = f"{namespace}/{pod_name}"
+        for metric_name, query in build_pod_queries(pod_name).items():
+            queries[(pod_key, metric_name)] = query
+    values = get_metric_values(queries)
+    
     pod_data = {}
     
     for namespace, pod_name, node_name in pods:
         pod_key = f"{namespace}/{pod_name}"
-        pod_data[pod_key] = collect_pod_metrics(pod_name, namespace, node_name)
+        pod_metrics = {
+            "namespace": namespace,
+            "pod": pod_name,
+            "node": node_name
+        }
+        for metric_name in POD_QUERIES:
+            pod_metrics[metric_name] = values[(pod_key, metric_name)]
+        pod_data[pod_key] = pod_metrics
         
-    return pod_data
\ No newline at end of file
+    return pod_data
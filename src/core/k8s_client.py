@@ -2,8 +2,193 @@
 Kubernetes client for interacting with the cluster.
 """
 
-from kubernetes import client, config
-from config.settings import K8S_CONTEXT
+import threading
+
+from kubernetes import client, config, watch
+from kubernetes.client.rest import ApiException
+from config.settings import K8S_CONTEXT, K8S_WATCH_TIMEOUT_SECONDS
+
+
+class NodeAddressIndex:
+    """
+    Index of node names to InternalIP addresses built from listed V1Node objects.
+    
+    Each node's resourceVersion is remembered so that unchanged nodes are not
+    re-parsed, and the list's own resourceVersion lets a whole unchanged list be
+    skipped.
+    """
+    
+    def __init__(self):
+        self._addresses = {}
+        self._resource_versions = {}
+        self._list_resource_version = None
+        self._lock = threading.Lock()
+    
+    def sync(self, nodes, list_resource_version=None):
+        """
+        Replace the index contents with a full node list.
+        
+        Args:
+            nodes (list): List of V1Node objects
+            list_resource_version (str): resourceVersion of the node list, if known
+        """
+        with self._lock:
+            if list_resource_version and list_resource_version == self._list_resource_version:
+                return
+            names = set()
+            for node in nodes:
+                names.add(node.metadata.name)
+                self._upsert(node)
+            for name in set(self._addresses) - names:
+                self._remove(name)
+            self._list_resource_version = list_resource_version
+    
+    def upsert(self, node):
+        """Add or refresh a single V1Node."""
+        with self._lock:
+            self._upsert(node)
+    
+    def remove(self, node_name):
+        """Drop a node from the index."""
+        with self._lock:
+            self._remove(node_name)
+    
+    def get(self, node_name):
+        """Return the InternalIP of a node, or None if it is not indexed."""
+        return self._addresses.get(node_name)
+    
+    def _upsert(self, node):
+        name = node.metadata.name
+        resource_version = node.metadata.resource_version
+        if resource_version and self._resource_versions.get(name) == resource_version:
+            return
+        self._addresses[name] = next(
+            (address.address for address in (node.status.addresses or [])
+             if address.type == "InternalIP"),
+            None
+        )
+        self._resource_versions[name] = resource_version
+    
+    def _remove(self, node_name):
+        self._addresses.pop(node_name, None)
+        self._resource_versions.pop(node_name, None)
+
+
+# Shared node address index, filled by get_k8s_nodes or the node informer
+node_addresses = NodeAddressIndex()
+
+
+class Informer:
+    """
+    Local cache of one Kubernetes resource kind, kept current by a watch.
+    
+    The resource is listed once, then ``watch=True`` deltas are applied from the
+    list's resourceVersion onwards. When the API server answers 410 Gone (the
+    resourceVersion is too old) the resource is listed again.
+    
+    Args:
+        name (str): Name used in log messages and the thread name
+        list_func (callable): CoreV1Api list method, e.g. ``list_pod_for_all_namespaces``
+        on_sync (callable): Called with the object list after every full list
+        on_upsert (callable): Called with each added or modified object
+        on_delete (callable): Called with each deleted object
+    """
+    
+    RETRY_SECONDS = 5
+    
+    def __init__(self, name, list_func, on_sync=None, on_upsert=None, on_delete=None):
+        self.name = name
+        self.list_func = list_func
+        self.on_sync = on_sync
+        self.on_upsert = on_upsert
+        self.on_delete = on_delete
+        self.resource_version = None
+        self._store = {}
+        self._lock = threading.Lock()
+        self._synced = threading.Event()
+        self._stopped = threading.Event()
+        self._watch = None
+        self._thread = None
+    
+    @property
+    def synced(self):
+        """Whether the initial list has completed."""
+        return self._synced.is_set()
+    
+    def start(self, wait_seconds=30):
+        """
+        Start the list/watch thread and wait for the initial list.
+        
+        Returns:
+            bool: True if the cache synced within ``wait_seconds``
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"informer-{self.name}", daemon=True)
+            self._thread.start()
+        return self._synced.wait(wait_seconds)
+    
+    def stop(self):
+        """Stop watching; the cached objects stay readable."""
+        self._stopped.set()
+        if self._watch is not None:
+            self._watch.stop()
+    
+    def items(self):
+        """Return a snapshot of the cached objects."""
+        with self._lock:
+            return list(self._store.values())
+    
+    def _relist(self):
+        result = self.list_func(watch=False)
+        with self._lock:
+            self._store = {obj.metadata.uid: obj for obj in result.items}
+        self.resource_version = result.metadata.resource_version
+        if self.on_sync:
+            self.on_sync(result.items)
+        self._synced.set()
+    
+    def _apply(self, event_type, obj):
+        with self._lock:
+            if event_type == "DELETED":
+                self._store.pop(obj.metadata.uid, None)
+            else:
+                self._store[obj.metadata.uid] = obj
+        if event_type == "DELETED":
+            if self.on_delete:
+                self.on_delete(obj)
+        elif self.on_upsert:
+            self.on_upsert(obj)
+        self.resource_version = obj.metadata.resource_version
+    
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                if self.resource_version is None:
+                    self._relist()
+                self._watch = watch.Watch()
+                for event in self._watch.stream(
+                    self.list_func,
+                    resource_version=self.resource_version,
+                    timeout_seconds=K8S_WATCH_TIMEOUT_SECONDS
+                ):
+                    if event["type"] == "ERROR":
+                        raise ApiException(status=event["raw_object"].get("code"),
+                                           reason=event["raw_object"].get("message"))
+                    self._apply(event["type"], event["object"])
+            except ApiException as e:
+                if e.status == 410:
+                    # resourceVersion expired: list again from scratch
+                    self.resource_version = None
+                else:
+                    print(f"Error watching {self.name}: {e}")
+                    self._stopped.wait(self.RETRY_SECONDS)
+            except Exception as e:
+                print(f"Error watching {self.name}: {e}")
+                self._stopped.wait(self.RETRY_SECONDS)
+
+
+# Informers started by start_informers, keyed by resource
+informers = {}
 
 
 def initialize_k8s_client():
@@ -22,6 +207,45 @@ def initialize_k8s_client():
             return False
 
 
+def start_informers(wait_seconds=30):
+    """
+    Start watch caches for pods, nodes and events.
+    
+    Once started, get_k8s_pods, get_k8s_nodes and get_k8s_events read from the
+    caches instead of listing from the API server on every call.
+    
+    Args:
+        wait_seconds (int): How long to wait for each initial list
+        
+    Returns:
+        bool: True if every cache synced in time
+    """
+    v1 = client.CoreV1Api()
+    informers.setdefault("pods", Informer("pods", v1.list_pod_for_all_namespaces))
+    informers.setdefault("nodes", Informer(
+        "nodes", v1.list_node,
+        on_sync=node_addresses.sync,
+        on_upsert=node_addresses.upsert,
+        on_delete=lambda node: node_addresses.remove(node.metadata.name)
+    ))
+    informers.setdefault("events", Informer("events", v1.list_event_for_all_namespaces))
+    return all([informer.start(wait_seconds) for informer in informers.values()])
+
+
+def stop_informers():
+    """Stop all running watch caches."""
+    for informer in informers.values():
+        informer.stop()
+
+
+def _cached_items(resource):
+    """Return cached objects of a resource, or None if no synced informer exists."""
+    informer = informers.get(resource)
+    if informer is not None and informer.synced:
+        return informer.items()
+    return None
+
+
 def get_k8s_pods():
     """
     Get all pods in the cluster.
@@ -29,6 +253,10 @@ def get_k8s_pods():
     Returns:
         list: List of tuples containing (namespace, pod_name, node_name)
     """
+    cached = _cached_items("pods")
+    if cached is not None:
+        return [(pod.metadata.namespace, pod.metadata.name, pod.spec.node_name)
+                for pod in cached]
     try:
         v1 = client.CoreV1Api()
         pods = v1.list_pod_for_all_namespaces(watch=False)
@@ -46,15 +274,44 @@ def get_k8s_nodes():
     Returns:
         list: List of node names
     """
+    cached = _cached_items("nodes")
+    if cached is not None:
+        return [node.metadata.name for node in cached]
     try:
         v1 = client.CoreV1Api()
         nodes = v1.list_node(watch=False)
+        node_addresses.sync(nodes.items, nodes.metadata.resource_version)
         return [node.metadata.name for node in nodes.items]
     except Exception as e:
         print(f"Error getting nodes: {e}")
         return []
 
 
+def get_node_address(node_name):
+    """
+    Get the InternalIP address of a node from the node address index.
+    
+    Nodes not yet indexed (e.g. created since the last get_k8s_nodes call) are
+    read once from the API and added to the index.
+    
+    Args:
+        node_name (str): Name of the node
+        
+    Returns:
+        str: InternalIP of the node, or None if unavailable
+    """
+    address = node_addresses.get(node_name)
+    if address is not None:
+        return address
+    try:
+        v1 = client.CoreV1Api()
+        node_addresses.upsert(v1.read_node(node_name))
+        return node_addresses.get(node_name)
+    except Exception as e:
+        print(f"Error getting address for node {node_name}: {e}")
+        return None
+
+
 def get_k8s_deployments():
     """
     Get all deployments in the cluster.
@@ -79,6 +336,9 @@ def get_k8s_events():
     Returns:
         list: List of event objects
     """
+    cached = _cached_items("events")
+    if cached is not None:
+        return cached
     try:
         v1 = client.CoreV1Api()
         events = v1.list_event_for_all_namespaces(watch=False)
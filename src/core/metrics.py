@@ -0,0 +1,111 @@
+"""
+Self-metrics of the collector, exposed in Prometheus text format on /metrics.
+"""
+
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from config.settings import METRICS_PORT, METRICS_ADDR
+
+# Buckets from a few milliseconds (cache hits, small batches) to a full polling interval and beyond
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "kubeboom_stage_duration_seconds",
+    "Time spent in each step of a collection cycle",
+    ["stage"], buckets=LATENCY_BUCKETS
+)
+CYCLES = Counter("kubeboom_cycles_total", "Collection cycles completed")
+CYCLES_SKIPPED = Counter("kubeboom_cycles_skipped_total", "Collection cycles skipped because the fetch stage was behind")
+STAGE_ERRORS = Counter("kubeboom_stage_errors_total", "Collection cycles dropped by an error", ["stage"])
+
+PROMETHEUS_QUERIES = Counter("kubeboom_prometheus_queries_total", "PromQL queries sent to Prometheus")
+PROMETHEUS_ERRORS = Counter("kubeboom_prometheus_errors_total", "PromQL queries that failed or timed out")
+PROMETHEUS_QUERY_SECONDS = Histogram(
+    "kubeboom_prometheus_query_duration_seconds",
+    "Latency of single PromQL queries",
+    buckets=LATENCY_BUCKETS
+)
+
+ROWS_EXPORTED = Counter("kubeboom_rows_exported_total", "Rows written to the storage backend", ["kind"])
+EXPORT_QUEUE_DEPTH = Gauge("kubeboom_export_queue_depth", "Rows queued or buffered by the exporter and not written yet")
+EXPORT_DROPPED = Counter("kubeboom_export_dropped_rows_total", "Rows dropped by the exporter without being written")
+EXPORT_RETRIES = Counter("kubeboom_export_retries_total", "Failed writes retried by the write-behind exporter")
+ROWS_PREDICTED = Counter("kubeboom_rows_predicted_total", "Rows annotated with a prediction", ["target"])
+
+PREDICTION_CACHE_HITS = Counter("kubeboom_prediction_cache_hits_total", "Predictions served from the cache")
+PREDICTION_CACHE_MISSES = Counter("kubeboom_prediction_cache_misses_total", "Predictions the cache did not hold")
+PREDICTION_CACHE_HIT_RATIO = Gauge("kubeboom_prediction_cache_hit_ratio", "Share of predictions served from the cache")
+PREDICTION_CACHE_SIZE = Gauge("kubeboom_prediction_cache_entries", "Feature vectors held in the prediction cache")
+
+
+@contextmanager
+def timed(stage):
+    """
+    Record the duration of the with-block in the stage latency histogram.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - start)
+
+
+def timed_stage(stage):
+    """
+    Decorator form of timed() that also counts the errors raised by the function.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(stage):
+                try:
+                    return func(*args, **kwargs)
+                except Exception:
+                    STAGE_ERRORS.labels(stage=stage).inc()
+                    raise
+        return wrapper
+    return decorator
+
+
+def track_prediction_cache(cache):
+    """
+    Report the hit ratio and the size of a PredictionCache at scrape time.
+    Hits and misses are counted by the predictor as they happen.
+    """
+    PREDICTION_CACHE_HIT_RATIO.set_function(lambda: cache.stats()["hit_rate"])
+    PREDICTION_CACHE_SIZE.set_function(lambda: cache.stats()["size"])
+
+
+def count_exported(dataset, rows):
+    """
+    Count rows that reached the storage backend, by kind ("pod_metrics" counts as "pod").
+    """
+    ROWS_EXPORTED.labels(kind=dataset.split("_")[0]).inc(rows)
+
+
+def track_export_queue(exporter):
+    """
+    Report the rows an exporter holds in memory (write-behind queue or Parquet buffers) at scrape time.
+    """
+    EXPORT_QUEUE_DEPTH.set_function(exporter.queue_depth)
+
+
+def start_metrics_server(port=METRICS_PORT, addr=METRICS_ADDR):
+    """
+    Serve /metrics on a background thread.
+
+    Returns:
+        bool: False if disabled (port 0) or the port could not be bound
+    """
+    if not port:
+        return False
+    try:
+        start_http_server(port, addr=addr)
+        return True
+    except OSError as e:
+        print(f"Error starting metrics server on {addr}:{port}: {e}")
+        return False
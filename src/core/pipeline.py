@@ -0,0 +1,177 @@
+"""
+Staged collection pipeline driven by a wall-clock scheduler.
+
+Each stage runs on its own thread and hands its output to the next stage
+through a bounded queue, so cycle N can be exported while cycle N+1 is
+being fetched. A full queue blocks the stage in front of it (backpressure);
+when the first stage is still busy at a tick, the tick is skipped, which
+coalesces the missed cycles into the next one.
+"""
+
+import queue
+import threading
+import time
+
+from core.metrics import CYCLES_SKIPPED
+
+
+class IntervalScheduler:
+    """
+    Fires on wall-clock multiples of the interval, independently of how long
+    the work between two ticks takes, so the period does not drift.
+
+    Args:
+        interval (float): Seconds between ticks
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.missed = 0
+
+    def next_tick(self, now=None):
+        """First interval boundary strictly after now."""
+        now = time.time() if now is None else now
+        return (now // self.interval + 1) * self.interval
+
+    def ticks(self, stop=None):
+        """
+        Yield the epoch time of every boundary as it is reached.
+
+        Boundaries already in the past when the caller comes back are not
+        replayed: they are counted in ``missed`` and the next future one is used.
+
+        Args:
+            stop (threading.Event): Ends the generator when set
+        """
+        tick = self.next_tick()
+        while stop is None or not stop.is_set():
+            delay = tick - time.time()
+            if delay > 0:
+                if stop is not None:
+                    if stop.wait(delay):
+                        return
+                else:
+                    time.sleep(delay)
+            yield tick
+            next_tick = self.next_tick()
+            self.missed += max(0, round((next_tick - tick) / self.interval) - 1)
+            tick = next_tick
+
+
+class Stage:
+    """
+    One step of the pipeline.
+
+    Args:
+        name (str): Name used in log messages and the thread name
+        func (callable): Takes the previous stage's output and returns this stage's;
+            returning None drops the cycle
+    """
+
+    def __init__(self, name, func):
+        self.name = name
+        self.func = func
+
+
+class Pipeline:
+    """
+    Runs stages on separate threads connected by bounded queues.
+
+    Args:
+        stages (list): Stage objects, in order
+        queue_size (int): Cycles that may wait between two stages
+        log (callable): Called with (message, level) for errors and skipped cycles
+    """
+
+    _DONE = object()
+    # Seconds a blocked stage waits on a queue before checking whether it should stop
+    _POLL_SECONDS = 0.5
+
+    def __init__(self, stages, queue_size=1, log=print):
+        self.stages = stages
+        self.log = log
+        self.skipped = 0
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in stages]
+        self._threads = []
+        self._stop = threading.Event()
+
+    def start(self):
+        self._stop.clear()
+        for i, stage in enumerate(self.stages):
+            outbox = self._queues[i + 1] if i + 1 < len(self.stages) else None
+            thread = threading.Thread(
+                target=self._run_stage, args=(stage, self._queues[i], outbox),
+                name=f"pipeline-{stage.name}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, item):
+        """
+        Offer a new cycle to the first stage without blocking.
+
+        Returns:
+            bool: False if the first stage is still behind and the cycle was skipped
+        """
+        try:
+            self._queues[0].put_nowait(item)
+            return True
+        except queue.Full:
+            self.skipped += 1
+            CYCLES_SKIPPED.inc()
+            return False
+
+    def run(self, scheduler, make_item, stop=None):
+        """
+        Start the stages and submit make_item(tick) on every scheduler tick until stop is set.
+        """
+        self.start()
+        for tick in scheduler.ticks(stop):
+            if not self.submit(make_item(tick)):
+                self.log(f"Skipping cycle at {tick:.0f}: '{self.stages[0].name}' stage is still busy", "WARNING")
+
+    def stop(self, timeout=None):
+        """
+        Let the cycles already queued drain, then stop the stage threads.
+
+        Waits at most ``timeout`` seconds in total. Cycles still queued after
+        that are dropped and the stages return as soon as their current call ends.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self._queues[0].put(self._DONE, timeout=timeout)
+            for thread in self._threads:
+                thread.join(None if deadline is None else max(0, deadline - time.monotonic()))
+        except queue.Full:
+            pass
+        if any(thread.is_alive() for thread in self._threads):
+            self.log(f"Pipeline did not drain within {timeout}s, dropping the queued cycles", "WARNING")
+        self._stop.set()
+
+    def _run_stage(self, stage, inbox, outbox):
+        while not self._stop.is_set():
+            try:
+                item = inbox.get(timeout=self._POLL_SECONDS)
+            except queue.Empty:
+                continue
+            if item is self._DONE:
+                if outbox is not None:
+                    self._hand_on(outbox, self._DONE)
+                return
+            try:
+                result = stage.func(item)
+            except Exception as e:
+                self.log(f"Error in {stage.name} stage: {e}", "ERROR")
+                continue
+            if result is not None and outbox is not None:
+                # Blocks while the next stage is behind
+                self._hand_on(outbox, result)
+
+    def _hand_on(self, outbox, item):
+        """Put an item in the next stage's queue, giving up once the pipeline is stopped."""
+        while not self._stop.is_set():
+            try:
+                outbox.put(item, timeout=self._POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
@@ -2,8 +2,147 @@
 Prometheus client for querying metrics.
 """
 
+import asyncio
+import concurrent.futures
+import math
+import threading
+import time
+
+import httpx
 import requests
-from config.settings import PROMETHEUS_URL
+from core.metrics import PROMETHEUS_QUERIES, PROMETHEUS_ERRORS, PROMETHEUS_QUERY_SECONDS
+from config.settings import (
+    PROMETHEUS_URL, PROMETHEUS_MAX_CONCURRENCY,
+    PROMETHEUS_QUERY_TIMEOUT, PROMETHEUS_KEEPALIVE_SECONDS
+)
+
+# Keep-alive session for one-off synchronous queries
+session = requests.Session()
+
+
+class AsyncPrometheusClient:
+    """
+    Asyncio Prometheus client with a pooled keep-alive HTTP connection pool.
+    
+    At most ``max_concurrency`` queries are in flight at once and each query is
+    bounded by ``timeout`` seconds. The underlying httpx client is created on
+    first use and is bound to the event loop that created it.
+    """
+    
+    def __init__(self, base_url=PROMETHEUS_URL, max_concurrency=PROMETHEUS_MAX_CONCURRENCY,
+                 timeout=PROMETHEUS_QUERY_TIMEOUT, keepalive_expiry=PROMETHEUS_KEEPALIVE_SECONDS):
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.keepalive_expiry = keepalive_expiry
+        self._client = None
+        self._semaphore = None
+    
+    def _ensure_client(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                    keepalive_expiry=self.keepalive_expiry
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+    
+    async def query(self, query):
+        """
+        Run a PromQL query against the Prometheus server.
+        
+        Args:
+            query (str): The PromQL query to execute
+            
+        Returns:
+            list: List of results from the query, empty on error or timeout
+        """
+        client = self._ensure_client()
+        async with self._semaphore:
+            PROMETHEUS_QUERIES.inc()
+            start = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(
+                    client.get("/api/v1/query", params={"query": query}), self.timeout
+                )
+                response.raise_for_status()
+                return response.json().get("data", {}).get("result", [])
+            except (httpx.HTTPError, asyncio.TimeoutError, ValueError) as e:
+                # ValueError: a 200 answer that is not JSON, e.g. from a proxy or login page
+                PROMETHEUS_ERRORS.inc()
+                print(f"Error querying Prometheus: {e!r}")
+                return []
+            finally:
+                PROMETHEUS_QUERY_SECONDS.observe(time.perf_counter() - start)
+    
+    async def query_many(self, queries):
+        """
+        Run several PromQL queries concurrently.
+        
+        Args:
+            queries (dict): Mapping of arbitrary keys to PromQL queries
+            
+        Returns:
+            dict: Mapping of the same keys to their query results
+        """
+        keys = list(queries)
+        results = await asyncio.gather(*(self.query(queries[key]) for key in keys))
+        return dict(zip(keys, results))
+    
+    async def aclose(self):
+        """Close the pooled connections."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Shared client and the background event loop it runs on
+async_client = AsyncPrometheusClient()
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="prometheus-client", daemon=True).start()
+    return _loop
+
+
+def run_promql_queries(queries):
+    """
+    Run many PromQL queries at once and wait for all of them.
+    
+    Queries are fanned out on the shared AsyncPrometheusClient, so the call takes
+    about as long as the slowest query rather than the sum of all of them. The
+    wait is bounded by the time the queries may take at the concurrency limit,
+    so a wedged event loop cannot hang the caller.
+    
+    Args:
+        queries (dict): Mapping of arbitrary keys to PromQL queries
+        
+    Returns:
+        dict: Mapping of the same keys to their query results, empty lists if the batch timed out
+    """
+    if not queries:
+        return {}
+    waves = math.ceil(len(queries) / async_client.max_concurrency)
+    deadline = async_client.timeout * waves + 5
+    future = asyncio.run_coroutine_threadsafe(async_client.query_many(queries), _get_loop())
+    try:
+        return future.result(timeout=deadline)
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        PROMETHEUS_ERRORS.inc(len(queries))
+        print(f"Error querying Prometheus: {len(queries)} queries did not finish within {deadline:.0f}s")
+        return {key: [] for key in queries}
 
 
 def run_promql_query(query):
@@ -16,13 +155,57 @@ def run_promql_query(query):
     Returns:
         list: List of results from the query
     """
+    PROMETHEUS_QUERIES.inc()
+    start = time.perf_counter()
     try:
-        response = requests.get(f"{PROMETHEUS_URL}/api/v1/query", params={"query": query})
+        response = session.get(
+            f"{PROMETHEUS_URL}/api/v1/query",
+            params={"query": query},
+            timeout=PROMETHEUS_QUERY_TIMEOUT
+        )
         response.raise_for_status()
         return response.json().get("data", {}).get("result", [])
     except requests.exceptions.RequestException as e:
+        PROMETHEUS_ERRORS.inc()
         print(f"Error querying Prometheus: {e}")
         return []
+    finally:
+        PROMETHEUS_QUERY_SECONDS.observe(time.perf_counter() - start)
+
+
+def first_value(results, default=None):
+    """
+    Get the value of the first series in a query result.
+    
+    Args:
+        results (list): Results of a PromQL query
+        default: Default value to return if there are no results
+        
+    Returns:
+        float: The metric value or default if not found
+    """
+    return float(results[0]['value'][1]) if results else default
+
+
+def vector_values(results, by):
+    """
+    Index a query result vector by label values.
+    
+    Args:
+        results (list): Results of a PromQL query
+        by (tuple): Label names identifying each series in the result
+        
+    Returns:
+        dict: Mapping of label-value tuples to metric values. When several series
+        share the same labels the first one wins, like in first_value.
+    """
+    values = {}
+    for result in results:
+        metric = result.get("metric", {})
+        key = tuple(metric.get(label) for label in by)
+        if key not in values:
+            values[key] = float(result['value'][1])
+    return values
 
 
 def get_metric_value(query, default=None):
@@ -36,5 +219,33 @@ def get_metric_value(query, default=None):
     Returns:
         float: The metric value or default if not found
     """
-    results = run_promql_query(query)
-    return float(results[0]['value'][1]) if results else default
\ No newline at end of file
+    return first_value(run_promql_query(query), default)
+
+
+def get_metric_values(queries, default=None):
+    """
+    Get single metric values for many PromQL queries run concurrently.
+    
+    Args:
+        queries (dict): Mapping of arbitrary keys to PromQL queries
+        default: Default value for queries without results
+        
+    Returns:
+        dict: Mapping of the same keys to metric values
+    """
+    return {key: first_value(results, default) for key, results in run_promql_queries(queries).items()}
+
+
+def get_metric_vector(query, by):
+    """
+    Run a grouped PromQL query and index its result vector by label values.
+    
+    Args:
+        query (str): The PromQL query to execute, e.g. a ``sum by (namespace, pod)`` query
+        by (tuple): Label names identifying each series in the result
+        
+    Returns:
+        dict: Mapping of label-value tuples to metric values
+    """
+    return vector_values(run_promql_query(query), by)
+
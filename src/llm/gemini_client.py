@@ -0,0 +1,45 @@
+import asyncio
+import google.generativeai as genai
+import os
+from dotenv import load_dotenv
+
+from config.settings import LLM_TIMEOUT, LLM_MAX_CONCURRENCY, LLM_QUEUE_TIMEOUT
+
+load_dotenv()
+genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+model = genai.GenerativeModel("gemini-1.5-flash-latest")
+
+# Calls in flight at once; further requests wait up to LLM_QUEUE_TIMEOUT for a slot
+_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+
+class LLMBusyError(Exception):
+    """Every call slot stayed taken for LLM_QUEUE_TIMEOUT seconds."""
+
+
+async def generate(prompt: str) -> str:
+    """
+    Ask Gemini for a completion without blocking the event loop.
+
+    Args:
+        prompt (str): Full prompt text
+
+    Returns:
+        str: Text of the answer
+
+    Raises:
+        LLMBusyError: If LLM_MAX_CONCURRENCY calls are already running for too long
+        asyncio.TimeoutError: If Gemini does not answer within LLM_TIMEOUT seconds
+    """
+    try:
+        await asyncio.wait_for(_slots.acquire(), LLM_QUEUE_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise LLMBusyError(f"{LLM_MAX_CONCURRENCY} LLM requests already in progress, try again shortly")
+    try:
+        response = await asyncio.wait_for(
+            model.generate_content_async(prompt, request_options={"timeout": LLM_TIMEOUT}),
+            LLM_TIMEOUT
+        )
+        return response.text
+    finally:
+        _slots.release()
@@ -1,12 +1,6 @@
-import google.generativeai as genai
-import os
-from dotenv import load_dotenv
+from llm.gemini_client import generate
 
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel("gemini-1.5-flash-latest")
-
-def explain_pod_prediction(data: dict) -> str:
+async def explain_pod_prediction(data: dict) -> str:
     prompt = f"""
 You are a Kubernetes expert helping to analyze pod health predictions based on resource metrics and alert signals.
 
@@ -49,10 +43,9 @@ A pod was predicted as **'{data['predicted_label']}'** with the following metric
 
 Use clear reasoning and align explanations with the relevant metrics and alert signals.
 """
-    response = model.generate_content(prompt)
-    return response.text
+    return await generate(prompt)
 
-def explain_node_prediction(data: dict) -> str:
+async def explain_node_prediction(data: dict) -> str:
     # No need to recompute 'node_memory_utilization_ratio'
     data['time_since_node_start'] = data.get('node_age_seconds', 0.0)
 
@@ -93,5 +86,4 @@ The node **'{data.get('node_name', 'N/A')}'** was predicted as **'{data.get('pre
 
 Use detailed reasoning aligned with node metrics and conditions.
 """
-    response = model.generate_content(prompt)
-    return response.text
+    return await generate(prompt)
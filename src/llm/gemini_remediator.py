@@ -1,12 +1,6 @@
-import google.generativeai as genai
-import os
-from dotenv import load_dotenv
+from llm.gemini_client import generate
 
-load_dotenv()
-genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
-model = genai.GenerativeModel("gemini-1.5-flash-latest")
-
-def remediate_pod_prediction(data: dict) -> str:
+async def remediate_pod_prediction(data: dict) -> str:
     prompt = f"""
 You are a Kubernetes DevOps expert.
 
@@ -63,10 +57,10 @@ Your task is to generate a **bash script** that performs the following:
 
 Only output the bash script, and nothing else, definitely no markdown.
 """
-    response = model.generate_content(prompt)
-    return response.text.strip()
+    response = await generate(prompt)
+    return response.strip()
 
-def remediate_node_prediction(data: dict) -> str:
+async def remediate_node_prediction(data: dict) -> str:
     prompt = f"""
 You are a Kubernetes DevOps engineer.
 
@@ -107,5 +101,5 @@ Your job is to output:
 - Assume you're running this in a terminal with kubectl and access to the cluster.
 - Do not include markdown, YAML, or explanations.
 """
-    response = model.generate_content(prompt)
-    return response.text.strip()
\ No newline at end of file
+    response = await generate(prompt)
+    return response.strip()
\ No newline at end of file
@@ -1,15 +1,14 @@
-import time
 import pandas as pd
 
 # Core components
 from core.k8s_client import (
-    initialize_k8s_client, get_k8s_pods, get_k8s_nodes, 
+    initialize_k8s_client, start_informers, get_k8s_pods, get_k8s_nodes, 
     get_k8s_deployments, get_k8s_events
 )
 
 # Utils
 from utils.event_filter import (
-    get_new_events, filter_events_for_node, filter_events_for_pod,
+    EventIndex, get_new_events, filter_events_for_node, filter_events_for_pod,
     # filter_events_for_deployment
 )
 
@@ -25,20 +24,164 @@ from analyzers.pod_analyzer import check_pod_errors, add_error_flags as add_pod_
 
 # Storage
 from storage.csv_exporter import CSVExporter
-from storage.mongo_exporter import MongoExporter
+from storage.mongo_exporter import MongoExporter, WriteBehindMongoExporter
+from storage.parquet_exporter import ParquetExporter
+from storage.rollup import RollupCompactor
 
 # Predictor
-from predictor.predictor import predict_for_pod
-from predictor.predictor import predict_for_node
+from predictor.predictor import predict_pods_batch
+from predictor.predictor import predict_nodes_batch
+from predictor.predictor import warm_up
+from predictor.predictor import prediction_cache
+from predictor.predictor import start_model_reload, swap_models
+
+# Pipeline
+from core.pipeline import Pipeline, Stage, IntervalScheduler
+
+# Self-metrics
+from core.metrics import (
+    timed, timed_stage, start_metrics_server, track_prediction_cache, track_export_queue,
+    CYCLES, ROWS_PREDICTED, count_exported
+)
 
 # Settings
-from config.settings import STORAGE_BACKEND, POLLING_INTERVAL
+from config.settings import (
+    STORAGE_BACKEND, POLLING_INTERVAL, PIPELINE_QUEUE_SIZE, K8S_WATCH_CACHE,
+    MODEL_WARMUP, MODEL_RELOAD_INTERVAL, INFERENCE_SOCKET, METRICS_PORT, METRICS_ADDR,
+    MONGO_WRITE_BEHIND, ROLLUP_INTERVAL
+)
 
 
 def log(message, level="INFO"):
     timestamp = pd.Timestamp.now().isoformat()
     print(f"[{level}] {timestamp} - {message}")
 
+@timed_stage("fetch")
+def fetch(cycle):
+    """
+    Fetch stage: list Kubernetes objects and new events, and query their metrics.
+    """
+    timestamp = cycle["timestamp"]
+    log(f"Collecting metrics at {timestamp}...")
+
+    # Gather Kubernetes data
+    with timed("list_pods"):
+        pods = get_k8s_pods()
+    with timed("list_nodes"):
+        nodes = get_k8s_nodes()
+    # deployments = get_k8s_deployments()
+    with timed("list_events"):
+        all_events = get_k8s_events()
+        cycle["new_events"] = EventIndex(get_new_events(all_events))
+
+    # Collect metrics
+    with timed("collect_pods"):
+        cycle["pod_metrics"] = collect_all_pods_metrics(pods)
+    with timed("collect_nodes"):
+        cycle["node_metrics"] = collect_all_nodes_metrics(nodes)
+    #cycle["deployment_metrics"] = collect_all_deployments_metrics(deployments)
+    return cycle
+
+@timed_stage("analyze")
+def analyze(cycle):
+    """
+    Analyze stage: combine metrics with the errors found in metrics and events.
+    """
+    timestamp = cycle["timestamp"]
+    new_events = cycle.pop("new_events")
+
+    # Process pod metrics
+    combined_data_pods = []
+    for pod_key, pod_metric in cycle.pop("pod_metrics").items():
+        namespace, pod_name = pod_key.split("/", 1)
+        combined_metric = {"timestamp": timestamp.isoformat(), **pod_metric}
+        pod_events = filter_events_for_pod(new_events, namespace, pod_name)
+        pod_errors = check_pod_errors(pod_metric, pod_events)
+        combined_metric = add_pod_error_flags(combined_metric, pod_errors)
+        combined_data_pods.append(combined_metric)
+
+    # Process node metrics with error flags
+    combined_data_nodes = []
+    for node_name, node_metric in cycle.pop("node_metrics").items():
+        combined_metric = {"timestamp": timestamp.isoformat(), "node_name": node_name, **node_metric}
+        node_events = filter_events_for_node(new_events, node_name)
+        node_errors = check_node_errors(node_metric, node_events)
+        combined_metric = add_node_error_flags(combined_metric, node_errors)
+        combined_data_nodes.append(combined_metric)
+
+    # combined_data_deployments = [
+    #     {"timestamp": timestamp.isoformat(), **deployment_metrics[deployment_key]} 
+    #     for deployment_key in deployment_metrics
+    # ]
+
+    cycle["pods"] = combined_data_pods
+    cycle["nodes"] = combined_data_nodes
+    return cycle
+
+@timed_stage("predict")
+def predict(cycle):
+    """
+    Predict stage: annotate the whole cycle with model predictions.
+    """
+    # Switch to models loaded in the background since the last cycle
+    for target, version in swap_models().items():
+        log(f"Switched {target} model to {version}")
+
+    #Predict the whole cycle at once (Comment this line whenm capturing data for training)
+    with timed("predict_pods"):
+        cycle["pods"] = predict_pods_batch(cycle["pods"])
+    with timed("predict_nodes"):
+        cycle["nodes"] = predict_nodes_batch(cycle["nodes"])
+    ROWS_PREDICTED.labels(target="pod").inc(sum("predicted_label" in doc for doc in cycle["pods"]))
+    ROWS_PREDICTED.labels(target="node").inc(sum("predicted_label" in doc for doc in cycle["nodes"]))
+    if prediction_cache.enabled:
+        stats = prediction_cache.stats()
+        log(f"Prediction cache: {stats['hit_rate']:.0%} hit rate, {stats['size']} entries")
+    return cycle
+
+@timed_stage("export")
+def export(cycle, exporter):
+    """
+    Export stage: save the cycle to the selected backend.
+    """
+    combined_data_pods = cycle["pods"]
+    combined_data_nodes = cycle["nodes"]
+
+    # Export to selected backend
+    if STORAGE_BACKEND == "mongo":
+        log("Saving metrics to MongoDB...")
+        with timed("export_pods"):
+            pod_result = exporter.save_to_mongo(combined_data_pods, "pod_metrics")
+        with timed("export_nodes"):
+            node_result = exporter.save_to_mongo(combined_data_nodes, "node_metrics")
+        #deployment_result = exporter.save_to_mongo(combined_data_deployments, "deployment_metrics")
+        log(f"Pod metrics: {pod_result}")
+        log(f"Node metrics: {node_result}")
+        #log(f"Deployment metrics: {deployment_result}")
+    elif STORAGE_BACKEND == "parquet":
+        log("Saving metrics to Parquet...")
+        with timed("export_pods"):
+            pod_result = exporter.save_to_parquet(combined_data_pods, "pod_metrics")
+        with timed("export_nodes"):
+            node_result = exporter.save_to_parquet(combined_data_nodes, "node_metrics")
+        log(f"Pod metrics: {pod_result}")
+        log(f"Node metrics: {node_result}")
+    else:
+        log("Saving metrics to CSV...")
+        with timed("export_pods"):
+            pod_file = exporter.save_to_csv(combined_data_pods, filename='k8s_pod_metrics.csv')
+        with timed("export_nodes"):
+            node_file = exporter.save_to_csv(combined_data_nodes, filename='k8s_node_metrics.csv')
+        #deployment_file = exporter.save_to_csv(combined_data_deployments, filename='k8s_deployment_metrics.csv')
+        log(f"Pod metrics saved to: {pod_file}")
+        log(f"Node metrics saved to: {node_file}")
+        # log(f"Deployment metrics saved to: {deployment_file}")
+        # The other exporters count their rows once they are written
+        count_exported("pod_metrics", len(combined_data_pods))
+        count_exported("node_metrics", len(combined_data_nodes))
+
+    CYCLES.inc()
+
 def main():
     log("Starting Kubernetes monitoring...")
 
@@ -46,86 +189,73 @@ def main():
         log("Failed to initialize Kubernetes client. Exiting.", level="ERROR")
         return
 
-    exporter = MongoExporter() if STORAGE_BACKEND == "mongo" else CSVExporter()
+    if K8S_WATCH_CACHE:
+        if start_informers():
+            log("Started watch caches for pods, nodes and events")
+        else:
+            log("Watch caches not synced yet; listing from the API until they are", level="WARNING")
+
+    if INFERENCE_SOCKET:
+        log(f"Sending predictions to the inference service at {INFERENCE_SOCKET}")
+    else:
+        if MODEL_WARMUP:
+            timings = warm_up()
+            log("Warmed up models: " + ", ".join(f"{target} {seconds:.2f}s" for target, seconds in timings.items()))
+
+        if MODEL_RELOAD_INTERVAL > 0:
+            start_model_reload(MODEL_RELOAD_INTERVAL)
+            log(f"Checking for new model versions every {MODEL_RELOAD_INTERVAL}s")
+
+    if start_metrics_server():
+        log(f"Serving self-metrics at http://{METRICS_ADDR}:{METRICS_PORT}/metrics")
+    track_prediction_cache(prediction_cache)
+
+    if STORAGE_BACKEND == "mongo" and MONGO_WRITE_BEHIND:
+        # Rows are written by a background thread so a slow MongoDB never stalls the pipeline
+        exporter = WriteBehindMongoExporter()
+        track_export_queue(exporter)
+    elif STORAGE_BACKEND == "mongo":
+        exporter = MongoExporter()
+    elif STORAGE_BACKEND == "parquet":
+        exporter = ParquetExporter()
+        track_export_queue(exporter)
+    else:
+        exporter = CSVExporter()
     log(f"Initialized exporter: {type(exporter).__name__}")
 
-    while True:
+    if STORAGE_BACKEND == "mongo":
         try:
-            timestamp = pd.Timestamp.now()
-            log(f"Collecting metrics at {timestamp}...")
-
-            # Gather Kubernetes data
-            pods = get_k8s_pods()
-            nodes = get_k8s_nodes()
-            # deployments = get_k8s_deployments()
-            all_events = get_k8s_events()
-            new_events = get_new_events(all_events)
-
-            # Collect metrics
-            pod_metrics = collect_all_pods_metrics(pods)
-            node_metrics = collect_all_nodes_metrics(nodes)
-            #deployment_metrics = collect_all_deployments_metrics(deployments)
-
-            # Process pod metrics
-            combined_data_pods = []
-            for pod_key, pod_metric in pod_metrics.items():
-                namespace, pod_name = pod_key.split("/", 1)
-                combined_metric = {"timestamp": timestamp.isoformat(), **pod_metric}
-                pod_events = filter_events_for_pod(new_events, namespace, pod_name)
-                pod_errors = check_pod_errors(pod_metric, pod_events)
-                combined_metric = add_pod_error_flags(combined_metric, pod_errors)
-
-                #Predict and append (Comment this line whenm capturing data for training)
-                combined_metric = predict_for_pod(combined_metric)
-                combined_data_pods.append(combined_metric)
-                
-            # Process node metrics with predictions and error flags
-            combined_data_nodes = []
-            for node_name, node_metric in node_metrics.items():
-                combined_metric = {"timestamp": timestamp.isoformat(), "node_name": node_name, **node_metric}
-                node_events = filter_events_for_node(new_events, node_name)
-                node_errors = check_node_errors(node_metric, node_events)
-                combined_metric = add_node_error_flags(combined_metric, node_errors)
-                combined_metric = predict_for_node(combined_metric)
-                combined_data_nodes.append(combined_metric)
-
-            # Process node and deployment metrics
-            #combined_data_nodes = [
-               # {"timestamp": timestamp.isoformat(), "node_name": node_name, **node_metrics[node_name]} 
-                #for node_name in node_metrics
-            #]
-            # combined_data_deployments = [
-            #     {"timestamp": timestamp.isoformat(), **deployment_metrics[deployment_key]} 
-            #     for deployment_key in deployment_metrics
-            # ]
-            
-
-            # Export to selected backend
-            if STORAGE_BACKEND == "mongo":
-                log("Saving metrics to MongoDB...")
-                pod_result = exporter.save_to_mongo(combined_data_pods, "pod_metrics")
-                node_result = exporter.save_to_mongo(combined_data_nodes, "node_metrics")
-                #deployment_result = exporter.save_to_mongo(combined_data_deployments, "deployment_metrics")
-                log(f"Pod metrics: {pod_result}")
-                log(f"Node metrics: {node_result}")
-                #log(f"Deployment metrics: {deployment_result}")
-            else:
-                log("Saving metrics to CSV...")
-                pod_file = exporter.save_to_csv(combined_data_pods, filename='k8s_pod_metrics.csv')
-                node_file = exporter.save_to_csv(combined_data_nodes, filename='k8s_node_metrics.csv')
-                #deployment_file = exporter.save_to_csv(combined_data_deployments, filename='k8s_deployment_metrics.csv')
-                log(f"Pod metrics saved to: {pod_file}")
-                log(f"Node metrics saved to: {node_file}")
-                # log(f"Deployment metrics saved to: {deployment_file}")
-
-            time.sleep(POLLING_INTERVAL)
-
-        except KeyboardInterrupt:
-            log("Monitoring stopped by user.", level="INFO")
-            break
+            kinds = exporter.provision()
+            log("Provisioned MongoDB collections: " + ", ".join(f"{name} ({kind})" for name, kind in kinds.items()))
         except Exception as e:
-            log(f"Error in monitoring loop: {e}", level="ERROR")
-            time.sleep(POLLING_INTERVAL)
+            log(f"Could not provision MongoDB collections: {e}", level="WARNING")
+
+    compactor = None
+    if STORAGE_BACKEND == "mongo" and ROLLUP_INTERVAL > 0:
+        # 1-minute and 1-hour summaries served to long-range dashboard queries
+        compactor = RollupCompactor(exporter.db, pending_since=getattr(exporter, "oldest_pending", None))
+        compactor.start()
+        log(f"Rolling up metrics every {ROLLUP_INTERVAL}s")
+
+    # Fetch, analyze, predict and export run concurrently on consecutive cycles
+    pipeline = Pipeline([
+        Stage("fetch", fetch),
+        Stage("analyze", analyze),
+        Stage("predict", predict),
+        Stage("export", lambda cycle: export(cycle, exporter)),
+    ], queue_size=PIPELINE_QUEUE_SIZE, log=log)
+    scheduler = IntervalScheduler(POLLING_INTERVAL)
+
+    try:
+        pipeline.run(scheduler, lambda tick: {"timestamp": pd.Timestamp.fromtimestamp(tick)})
+    except KeyboardInterrupt:
+        log("Monitoring stopped by user.", level="INFO")
+        pipeline.stop(timeout=POLLING_INTERVAL)
+        if compactor is not None:
+            compactor.stop()
+        if hasattr(exporter, "close"):
+            # Write the rows still buffered or queued in memory
+            exporter.close()
 
 
 if __name__ == "__main__":
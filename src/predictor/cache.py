@@ -0,0 +1,89 @@
+"""
+Memoization of model outputs for unchanged feature vectors.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from config.settings import PREDICTION_CACHE_SIZE, PREDICTION_CACHE_STEP
+
+
+class PredictionCache:
+    """
+    LRU cache of class probabilities keyed by a quantized feature-vector hash.
+    
+    Keys combine the target, the model version and a hash of the scaled feature
+    vector rounded to ``step`` standard deviations, so vectors that only differ
+    by noise share an entry and a new model version never reuses old outputs.
+    
+    Args:
+        max_size (int): Maximum number of cached vectors, 0 disables the cache
+        step (float): Quantization step in standard deviations of each feature
+    """
+    
+    def __init__(self, max_size=PREDICTION_CACHE_SIZE, step=PREDICTION_CACHE_STEP):
+        self.max_size = max_size
+        self.step = step
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @property
+    def enabled(self):
+        return self.max_size > 0
+    
+    def keys(self, target, version, X_scaled):
+        """
+        Cache keys for each row of a scaled feature matrix.
+        
+        Args:
+            target (str): "pod" or "node"
+            version (str): Version of the model producing the probabilities
+            X_scaled (ndarray): Scaled, imputed feature matrix
+            
+        Returns:
+            list: One key per row
+        """
+        quantized = np.ascontiguousarray(np.rint(X_scaled / self.step), dtype=np.int64)
+        prefix = f"{target}|{version}|".encode()
+        return [hashlib.blake2b(prefix + row.tobytes(), digest_size=16).digest() for row in quantized]
+    
+    def get(self, key):
+        """Return the cached probabilities for a key, or None."""
+        with self._lock:
+            proba = self._entries.get(key)
+            if proba is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return proba
+    
+    def put(self, key, proba):
+        """Store the probabilities of a key, evicting the least recently used entries."""
+        with self._lock:
+            self._entries[key] = proba
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+    
+    def stats(self):
+        """Hit/miss counters, hit rate and current size."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._entries),
+            }
@@ -0,0 +1,85 @@
+"""
+NumPy feature assembly for the predictor.
+
+Maps a feature column schema onto fixed column indices once and fills a
+preallocated buffer straight from the metric dictionaries, so the prediction
+hot path creates no pandas objects.
+"""
+
+import threading
+
+import numpy as np
+
+
+class FeatureAssembler:
+    """
+    Builds feature matrices for a fixed column schema.
+    
+    Missing features are filled with 0.0, while None values become NaN,
+    which are imputed after scaling (see impute_missing). The returned
+    matrix is a view of a per-thread buffer that is reused by the next
+    call on the same thread.
+    
+    Args:
+        feature_cols (list): Ordered feature column names
+        dtype: NumPy dtype of the matrix (float64 or float32)
+    """
+    
+    def __init__(self, feature_cols, dtype=np.float64):
+        self.feature_cols = tuple(feature_cols)
+        self.index = {col: i for i, col in enumerate(self.feature_cols)}
+        self.dtype = dtype
+        self._local = threading.local()
+    
+    def _buffer(self, rows):
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or buffer.shape[0] < rows:
+            capacity = max(rows, 2 * buffer.shape[0] if buffer is not None else 1)
+            buffer = np.empty((capacity, len(self.feature_cols)), dtype=self.dtype)
+            self._local.buffer = buffer
+        return buffer[:rows]
+    
+    def assemble(self, docs):
+        """
+        Fill a (len(docs), n_features) matrix from metric dictionaries.
+        
+        Args:
+            docs (list): Metric dictionaries keyed by feature column name
+            
+        Returns:
+            numpy.ndarray: Feature matrix in schema column order
+        """
+        X = self._buffer(len(docs))
+        cols = self.feature_cols
+        for i, doc in enumerate(docs):
+            X[i] = [doc.get(col, 0.0) for col in cols]
+        return X
+    
+    def assemble_one(self, doc):
+        """Fill a one-row feature matrix from a single metric dictionary."""
+        return self.assemble((doc,))
+
+
+def scale_features(scaler, X):
+    """
+    Apply a fitted scaler to a feature matrix.
+    
+    StandardScaler statistics are applied in place with plain NumPy arithmetic,
+    skipping sklearn's per-call input validation; other scalers fall back to
+    their own transform.
+    """
+    if hasattr(scaler, "mean_") and hasattr(scaler, "scale_"):
+        if getattr(scaler, "with_mean", True):
+            X -= scaler.mean_
+        if getattr(scaler, "with_std", True):
+            X /= scaler.scale_
+        return X
+    return scaler.transform(X)
+
+
+def impute_missing(X_scaled):
+    """
+    Replace NaNs in a scaled matrix with 0, i.e. the training mean of the feature.
+    """
+    X_scaled[np.isnan(X_scaled)] = 0.0
+    return X_scaled
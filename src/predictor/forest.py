@@ -0,0 +1,147 @@
+"""
+Vectorized Random Forest inference.
+
+A fitted scikit-learn RandomForestClassifier is compiled into packed NumPy
+arrays (one row of nodes per tree) that are evaluated level by level for every
+tree and sample at once, instead of walking each tree separately. The compiled
+forest is stored next to the pickled model as a ``.npz`` file.
+
+Run this module to (re)compile models/random_forest_model.pkl:
+
+    python src/predictor/forest.py
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+
+class CompiledForest:
+    """
+    Random Forest packed into fixed-shape node arrays.
+    
+    Leaves point to themselves, so descending ``max_depth`` levels lands every
+    sample on its leaf in every tree. Probabilities are the mean of the
+    normalized leaf class distributions, as in RandomForestClassifier.predict_proba.
+    
+    Args:
+        feature (ndarray): (n_trees, n_nodes) split feature index
+        threshold (ndarray): (n_trees, n_nodes) split threshold
+        left (ndarray): (n_trees, n_nodes) left child index
+        right (ndarray): (n_trees, n_nodes) right child index
+        value (ndarray): (n_trees, n_nodes, n_classes) leaf class distribution
+        missing_left (ndarray): (n_trees, n_nodes) whether NaN goes to the left child
+        classes (ndarray): Encoded class labels
+        max_depth (int): Depth of the deepest tree
+    """
+    
+    ARRAYS = ("feature", "threshold", "left", "right", "value", "missing_left", "classes")
+    
+    def __init__(self, feature, threshold, left, right, value, missing_left, classes, max_depth):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.missing_left = missing_left
+        self.classes_ = classes
+        self.max_depth = int(max_depth)
+        self._trees = np.arange(feature.shape[0])[:, None]
+    
+    @classmethod
+    def from_sklearn(cls, forest):
+        """Compile a fitted RandomForestClassifier."""
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        n_trees = len(trees)
+        n_nodes = max(tree.node_count for tree in trees)
+        n_classes = len(forest.classes_)
+        
+        feature = np.zeros((n_trees, n_nodes), dtype=np.intp)
+        threshold = np.zeros((n_trees, n_nodes), dtype=np.float64)
+        left = np.tile(np.arange(n_nodes, dtype=np.intp), (n_trees, 1))
+        right = left.copy()
+        value = np.zeros((n_trees, n_nodes, n_classes), dtype=np.float64)
+        missing_left = np.zeros((n_trees, n_nodes), dtype=bool)
+        
+        for t, tree in enumerate(trees):
+            n = tree.node_count
+            is_split = tree.children_left[:n] != -1
+            feature[t, :n] = np.where(is_split, tree.feature[:n], 0)
+            threshold[t, :n] = np.where(is_split, tree.threshold[:n], 0.0)
+            left[t, :n] = np.where(is_split, tree.children_left[:n], np.arange(n))
+            right[t, :n] = np.where(is_split, tree.children_right[:n], np.arange(n))
+            leaf_value = tree.value[:n, 0, :n_classes]
+            normalizer = leaf_value.sum(axis=1, keepdims=True)
+            normalizer[normalizer == 0.0] = 1.0
+            value[t, :n] = leaf_value / normalizer
+            if hasattr(tree, "missing_go_to_left"):
+                missing_left[t, :n] = tree.missing_go_to_left[:n].astype(bool)
+        
+        max_depth = max(tree.max_depth for tree in trees)
+        return cls(feature, threshold, left, right, value, missing_left, forest.classes_, max_depth)
+    
+    @classmethod
+    def load(cls, path):
+        """Load a compiled forest saved with save."""
+        with np.load(path) as data:
+            return cls(*(data[name] for name in cls.ARRAYS), max_depth=data["max_depth"])
+    
+    def save(self, path):
+        """Save the compiled forest as a compressed .npz file."""
+        np.savez_compressed(
+            path,
+            feature=self.feature, threshold=self.threshold,
+            left=self.left, right=self.right, value=self.value,
+            missing_left=self.missing_left, classes=self.classes_,
+            max_depth=self.max_depth
+        )
+    
+    def predict_proba(self, X):
+        """
+        Class probabilities for a feature matrix.
+        
+        Features are cast to float32 before comparison, like scikit-learn's trees.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        samples = np.arange(X.shape[0])[None, :]
+        node = np.zeros((self.feature.shape[0], X.shape[0]), dtype=np.intp)
+        check_missing = np.isnan(X).any()
+        
+        for _ in range(self.max_depth):
+            x = X[samples, self.feature[self._trees, node]]
+            go_left = x <= self.threshold[self._trees, node]
+            if check_missing:
+                go_left |= np.isnan(x) & self.missing_left[self._trees, node]
+            node = np.where(go_left, self.left[self._trees, node], self.right[self._trees, node])
+        
+        return self.value[self._trees, node].mean(axis=0)
+    
+    def predict(self, X):
+        """Encoded class labels for a feature matrix."""
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1))
+
+
+def compile_forest(model_path, output_path=None):
+    """
+    Compile a pickled RandomForestClassifier and save it as ``.npz``.
+    
+    Args:
+        model_path (Path): Path of the pickled model
+        output_path (Path): Destination, defaults to the model path with a .npz suffix
+        
+    Returns:
+        Path: Path of the compiled forest
+    """
+    import joblib
+    
+    model_path = Path(model_path)
+    output_path = Path(output_path) if output_path else model_path.with_suffix(".npz")
+    CompiledForest.from_sklearn(joblib.load(model_path)).save(output_path)
+    return output_path
+
+
+if __name__ == "__main__":
+    default = Path(__file__).resolve().parents[2] / "models" / "random_forest_model.pkl"
+    source = sys.argv[1] if len(sys.argv) > 1 else default
+    print(f"Compiled forest saved to {compile_forest(source)}")
@@ -0,0 +1,127 @@
+"""
+Inference runtimes for the Keras neural network models.
+
+CompiledKerasModel traces a Keras model once into a tf.function with a fixed
+input signature and calls it directly, skipping the data-adapter pipeline that
+Model.predict sets up on every call. TFLiteModel runs the same network exported
+to TensorFlow Lite, so the collector can serve it with the small LiteRT / 
+tflite-runtime interpreter instead of keeping full TensorFlow resident.
+
+Run this module to export models/neural_net_model*.keras to .tflite:
+
+    python src/predictor/keras_runtime.py
+"""
+
+import sys
+import threading
+from pathlib import Path
+
+import numpy as np
+
+
+class CompiledKerasModel:
+    """
+    Keras model traced once into a tf.function taking float32 (batch, n_features) input.
+    
+    Args:
+        model: Loaded Keras model
+    """
+    
+    def __init__(self, model):
+        import tensorflow as tf
+        
+        self.model = model
+        self.n_features = int(model.inputs[0].shape[-1])
+        self._tf = tf
+        self._function = tf.function(
+            lambda X: model(X, training=False),
+            input_signature=[tf.TensorSpec(shape=(None, self.n_features), dtype=tf.float32)]
+        )
+    
+    def predict_proba(self, X):
+        """Class probabilities for a batch of scaled features."""
+        X = self._tf.convert_to_tensor(np.asarray(X, dtype=np.float32))
+        return self._function(X).numpy()
+
+
+class TFLiteModel:
+    """
+    TensorFlow Lite export of a neural network model.
+    
+    The interpreter's input is resized whenever the batch size changes; calls
+    are serialized because an interpreter is not thread-safe.
+    
+    Args:
+        path (Path): Path of the .tflite file
+    """
+    
+    def __init__(self, path):
+        self._interpreter = _tflite_interpreter()(model_path=str(path))
+        self._interpreter.allocate_tensors()
+        self._input = self._interpreter.get_input_details()[0]["index"]
+        self._output = self._interpreter.get_output_details()[0]["index"]
+        self._batch_size = None
+        self._lock = threading.Lock()
+    
+    def predict_proba(self, X):
+        """Class probabilities for a batch of scaled features."""
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        with self._lock:
+            if X.shape[0] != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input, X.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = X.shape[0]
+            self._interpreter.set_tensor(self._input, X)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output).copy()
+
+
+def _tflite_interpreter():
+    """Return the lightest available TensorFlow Lite Interpreter class."""
+    try:
+        from ai_edge_litert.interpreter import Interpreter
+    except ImportError:
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            import tensorflow as tf
+            Interpreter = tf.lite.Interpreter
+    return Interpreter
+
+
+def convert_to_tflite(model):
+    """
+    Convert a Keras model to a TensorFlow Lite flatbuffer.
+    
+    Returns:
+        bytes: The serialized .tflite model
+    """
+    import tensorflow as tf
+    
+    return tf.lite.TFLiteConverter.from_keras_model(model).convert()
+
+
+def export_tflite(model_path, output_path=None):
+    """
+    Export a saved Keras model to TensorFlow Lite.
+    
+    Args:
+        model_path (Path): Path of the .keras model
+        output_path (Path): Destination, defaults to the model path with a .tflite suffix
+        
+    Returns:
+        Path: Path of the exported model
+    """
+    from tensorflow.keras.models import load_model
+    
+    model_path = Path(model_path)
+    output_path = Path(output_path) if output_path else model_path.with_suffix(".tflite")
+    output_path.write_bytes(convert_to_tflite(load_model(model_path)))
+    return output_path
+
+
+if __name__ == "__main__":
+    models_dir = Path(__file__).resolve().parents[2] / "models"
+    sources = sys.argv[1:] or [models_dir / "neural_net_model.keras", models_dir / "neural_net_model_nodes.keras"]
+    for source in sources:
+        print(f"TensorFlow Lite model saved to {export_tflite(source)}")
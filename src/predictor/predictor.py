@@ -1,19 +1,13 @@
-import os
-import numpy as np
-import pandas as pd
-from pathlib import Path
-from dotenv import load_dotenv
-import joblib
-from config.settings import POD_ERROR_TYPES
-from tensorflow.keras.models import load_model
-
-# Load environment variables
-load_dotenv()
+import pickle
+from multiprocessing import AuthenticationError
 
-# Paths and setup
-BASE_DIR = Path(__file__).resolve().parents[2]
-MODEL_PATH = BASE_DIR / "models"
-MODEL_TYPE = os.getenv("MODEL_TYPE", "rf")  # Default to Random Forest
+import numpy as np
+from config.settings import INFERENCE_SOCKET
+from core.metrics import PREDICTION_CACHE_HITS, PREDICTION_CACHE_MISSES
+from predictor.cache import PredictionCache
+from predictor.features import FeatureAssembler, scale_features, impute_missing
+from predictor.registry import registry, predict_proba, predict_classes
+from predictor.service import InferenceClient
 
 # Feature columns used for both models
 FEATURE_COLS_PODS = [
@@ -41,103 +35,167 @@ FEATURE_COLS_NODES =[
     
 ]
 
-# Load model artifacts based on type
-if MODEL_TYPE == "nn":
-    print("Using Neural Network model")
-    model_pod = load_model(MODEL_PATH / "neural_net_model.keras")
-    scaler_pod = joblib.load(MODEL_PATH / "scaler_nn.pkl")
-    label_encoder_pod = joblib.load(MODEL_PATH / "label_encoder_nn.pkl")
-    
+# Precompiled NumPy assemblers for the feature schemas
+pod_features = FeatureAssembler(FEATURE_COLS_PODS)
+node_features = FeatureAssembler(FEATURE_COLS_NODES)
 
-    model_node = load_model(MODEL_PATH / "neural_net_model_nodes.keras")
-    scaler_node = joblib.load(MODEL_PATH / "scaler_nn_nodes.pkl")
-    label_encoder_node = joblib.load(MODEL_PATH / "label_encoder_nn_nodes.pkl")
-    
-    
-else:
-    print("Using Random Forest model")
-    model = joblib.load(MODEL_PATH / "random_forest_model.pkl")
-    scaler = joblib.load(MODEL_PATH / "scaler_rf.pkl")
-    label_encoder = joblib.load(MODEL_PATH / "label_encoder.pkl")
+# Model outputs of recently seen feature vectors
+prediction_cache = PredictionCache()
 
+# Shared inference service, if configured (see predictor/service.py)
+inference_client = InferenceClient(INFERENCE_SOCKET) if INFERENCE_SOCKET else None
+# Failures of the service after which the batch is predicted in-process: unreachable or
+# restarted server, wrong or rotated authkey, undecodable answer or an error on its side
+INFERENCE_ERRORS = (OSError, TimeoutError, EOFError, AuthenticationError, pickle.UnpicklingError, RuntimeError)
 
-def prepare_document_pods(doc):
+
+def warm_up():
     """
-    Ensures all features are present, fills missing with 0/0.0, returns as DataFrame.
+    Loads the configured models and runs one dummy prediction each.
+    Returns the seconds spent per target so cold start can be measured.
+    Nothing is loaded when predictions go to the inference service.
     """
-    processed = {}
-    for col in FEATURE_COLS_PODS:
-        if col not in doc:
-            processed[col] = 0 if col in POD_ERROR_TYPES else 0.0
-        else:
-            processed[col] = doc[col]
-    return pd.DataFrame([processed])
+    if inference_client is not None:
+        return {}
+    return registry.warm_up()
 
-def prepare_document_nodes(doc):
+def start_model_reload(interval):
     """
-    Ensures all features are present, fills missing with 0/0.0, returns as DataFrame.
+    Watches the model artifacts and loads new versions in the background.
+    They are served only after swap_models() is called.
     """
-    processed = {}
-    for col in FEATURE_COLS_NODES:
-        if col not in doc:
-            processed[col] = 0 if col in POD_ERROR_TYPES else 0.0
-        else:
-            processed[col] = doc[col]
-    return pd.DataFrame([processed])
-def predict_for_pod(doc):
+    if inference_client is not None:
+        # The inference service reloads its own models
+        return
+    registry.start_watcher(interval)
+
+def swap_models():
     """
-    Predicts class and probabilities for a single input document using selected model.
-    Replaces NaNs with None to make the result JSON serializable.
-    """ 
-    try:
-        X = prepare_document_pods(doc)
-        X_scaled = scaler_pod.transform(X)
+    Switches to the model versions loaded since the last call.
+    Returns the new version per swapped target.
+    """
+    return registry.swap()
 
-        if MODEL_TYPE == "nn":
-            y_proba = model_pod.predict(X_scaled)[0]
-            y_pred = [np.argmax(y_proba)]
-        else:
-            y_pred = model_pod.predict(X_scaled)
-            y_proba = model_pod.predict_proba(X_scaled)[0]
+def _json_safe(value):
+    """
+    Replaces None and NaN with 0 so the document is JSON serializable.
+    """
+    if value is None or (isinstance(value, (float, np.floating)) and value != value):
+        return 0
+    return value
 
-        label = label_encoder_pod.inverse_transform(y_pred)[0]
-        doc["predicted_label"] = label
+def _cached_predict_proba(artifacts, X_scaled, target):
+    """
+    Class probabilities for a scaled matrix, running the model only on rows
+    whose quantized feature vector is not in the prediction cache.
+    """
+    if not prediction_cache.enabled:
+        return predict_proba(artifacts, X_scaled)
+
+    keys = prediction_cache.keys(target, artifacts.version, X_scaled)
+    y_proba = np.empty((len(keys), len(artifacts.label_encoder.classes_)))
+    missed = []
+    for i, key in enumerate(keys):
+        proba = prediction_cache.get(key)
+        if proba is None:
+            missed.append(i)
+        else:
+            y_proba[i] = proba
 
-        for i, cls in enumerate(label_encoder_pod.classes_):
-            doc[f"prob_{cls}"] = float(y_proba[i])
+    PREDICTION_CACHE_HITS.inc(len(keys) - len(missed))
+    PREDICTION_CACHE_MISSES.inc(len(missed))
+    if missed:
+        y_proba[missed] = predict_proba(artifacts, X_scaled[missed])
+        for i in missed:
+            prediction_cache.put(keys[i], y_proba[i].copy())
+    return y_proba
 
-        # Replace NaNs with None for JSON safety
-        return {k: (0 if pd.isna(v) else v) for k, v in doc.items()}
-    except Exception as e:
-        return {"error": str(e)}
-    
-def predict_for_node(doc):
+def _predict_batch(docs, assembler, target):
     """
-    Predicts class and probabilities for a single input document using selected model.
-    Replaces NaNs with None to make the result JSON serializable.
+    Runs one scaler pass and one probability pass over the documents' feature
+    matrix and annotates each document with its predicted label and class probabilities.
     """
     try:
-        X = prepare_document_nodes(doc)
-        X_scaled = scaler_node.transform(X)
-
-        if MODEL_TYPE == "nn":
-            y_proba = model_node.predict(X_scaled)[0]
-            y_pred = [np.argmax(y_proba)]
-        else:
-            y_pred = model_node.predict(X_scaled)
-            y_proba = model_node.predict_proba(X_scaled)[0]
+        artifacts = registry.get(target)
+    except Exception as e:
+        return [{"error": str(e)} for _ in docs]
+    return _annotate(docs, assembler, artifacts, target)
 
-        label = label_encoder_node.inverse_transform(y_pred)[0]
+def _annotate(docs, assembler, artifacts, target):
+    """
+    Predicts the documents with the given artifacts. If the batch fails, its
+    halves are predicted separately, so only the rows that fail on their own
+    get an error document.
+    """
+    try:
+        X_scaled = impute_missing(scale_features(artifacts.scaler, assembler.assemble(docs)))
+        y_proba = _cached_predict_proba(artifacts, X_scaled, target)
+        labels = artifacts.label_encoder.inverse_transform(predict_classes(artifacts, y_proba))
+    except Exception as e:
+        if len(docs) == 1:
+            return [{"error": str(e)}]
+        middle = len(docs) // 2
+        return (_annotate(docs[:middle], assembler, artifacts, target)
+                + _annotate(docs[middle:], assembler, artifacts, target))
+
+    results = []
+    for doc, label, proba in zip(docs, labels, y_proba):
         doc["predicted_label"] = label
-
-        for i, cls in enumerate(label_encoder_node.classes_):
-            doc[f"prob_{cls}"] = float(y_proba[i])
+        doc["model_version"] = artifacts.version
+        for i, cls in enumerate(artifacts.label_encoder.classes_):
+            doc[f"prob_{cls}"] = float(proba[i])
 
         # Replace NaNs with None for JSON safety
-        return {k: (0 if pd.isna(v) else v) for k, v in doc.items()}
-    except Exception as e:
-        return {"error": str(e)}
+        results.append({k: _json_safe(v) for k, v in doc.items()})
+    return results
 
+def predict_local(target, docs):
+    """
+    Predicts a batch with the models of this process, whether or not an inference service is configured.
+    """
+    if not docs:
+        return []
+    assembler = pod_features if target == "pod" else node_features
+    return _predict_batch(docs, assembler, target)
 
+def _predict(target, docs):
+    """
+    Sends the batch to the inference service when one is configured, and
+    predicts in-process when there is none or it fails to answer.
+    """
+    if not docs:
+        return []
+    if inference_client is not None:
+        try:
+            return inference_client.predict(target, docs)
+        except INFERENCE_ERRORS as e:
+            print(f"Inference service unavailable, predicting in-process: {type(e).__name__}: {e}")
+    return predict_local(target, docs)
+
+def predict_pods_batch(docs):
+    """
+    Predicts class and probabilities for all pod documents of a cycle at once.
+    Returns the annotated documents in the same order and with the same keys as predict_for_pod.
+    """
+    return _predict("pod", docs)
 
+def predict_nodes_batch(docs):
+    """
+    Predicts class and probabilities for all node documents of a cycle at once.
+    Returns the annotated documents in the same order and with the same keys as predict_for_node.
+    """
+    return _predict("node", docs)
 
+def predict_for_pod(doc):
+    """
+    Predicts class and probabilities for a single input document using selected model.
+    Replaces NaNs with None to make the result JSON serializable.
+    """ 
+    return predict_pods_batch([doc])[0]
+    
+def predict_for_node(doc):
+    """
+    Predicts class and probabilities for a single input document using selected model.
+    Replaces NaNs with None to make the result JSON serializable.
+    """
+    return predict_nodes_batch([doc])[0]
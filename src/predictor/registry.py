@@ -0,0 +1,318 @@
+"""
+Lazy registry of the prediction models.
+
+Model backends are imported only when a model that needs them is first loaded,
+so importing the predictor does not pull in TensorFlow when MODEL_TYPE=rf, and
+no artifact is read from disk before the first prediction or warm-up.
+
+A manifest (models/manifest.json by default) can pin the artifact files and the
+version of each model type, e.g.
+
+    {"version": "2024-06-01", "models": {"nn": {"pod": ["keras", "nn_v2.keras", "scaler_v2.pkl", "label_encoder_v2.pkl"]}}}
+
+Writing the new files first and the manifest last rolls out a retrained model
+without the collector ever seeing a half-copied set of artifacts.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from pathlib import Path
+
+import joblib
+import numpy as np
+from dotenv import load_dotenv
+from config.settings import MODEL_MANIFEST
+
+# Load environment variables
+load_dotenv()
+
+# Paths and setup
+BASE_DIR = Path(__file__).resolve().parents[2]
+MODEL_PATH = BASE_DIR / "models"
+MODEL_TYPE = os.getenv("MODEL_TYPE", "rf")  # Default to Random Forest
+
+ModelArtifacts = namedtuple("ModelArtifacts", ["backend", "model", "scaler", "label_encoder", "version"])
+
+# Artifacts per model type and target: (backend, model file, scaler file, label encoder file)
+MODEL_ARTIFACTS = {
+    "nn": {
+        "pod": ("keras", "neural_net_model.keras", "scaler_nn.pkl", "label_encoder_nn.pkl"),
+        "node": ("keras", "neural_net_model_nodes.keras", "scaler_nn_nodes.pkl", "label_encoder_nn_nodes.pkl"),
+    },
+    "rf": {
+        # No Random Forest model is trained for nodes
+        "pod": ("sklearn", "random_forest_model.pkl", "scaler_rf.pkl", "label_encoder.pkl"),
+    },
+    # Same Random Forest compiled to NumPy arrays (see predictor/forest.py)
+    "rf_compiled": {
+        "pod": ("forest", "random_forest_model.npz", "scaler_rf.pkl", "label_encoder.pkl"),
+    },
+    # Same neural networks exported to TensorFlow Lite (see predictor/keras_runtime.py)
+    "nn_tflite": {
+        "pod": ("tflite", "neural_net_model.tflite", "scaler_nn.pkl", "label_encoder_nn.pkl"),
+        "node": ("tflite", "neural_net_model_nodes.tflite", "scaler_nn_nodes.pkl", "label_encoder_nn_nodes.pkl"),
+    },
+}
+
+
+def _load_keras(path):
+    from tensorflow.keras.models import load_model
+    from predictor.keras_runtime import CompiledKerasModel
+    return CompiledKerasModel(load_model(path))
+
+
+def _load_tflite(path):
+    from predictor.keras_runtime import TFLiteModel, export_tflite
+    if not path.exists():
+        # Not exported yet: convert the Keras model (needs TensorFlow)
+        print(f"{path.name} not found, exporting {path.with_suffix('.keras').name}")
+        export_tflite(path.with_suffix(".keras"), path)
+    return TFLiteModel(path)
+
+
+def _load_sklearn(path):
+    return joblib.load(path)
+
+
+def _load_forest(path):
+    from predictor.forest import CompiledForest
+    if path.exists():
+        return CompiledForest.load(path)
+    # Not exported yet: compile the pickled forest in memory
+    print(f"{path.name} not found, compiling {path.with_suffix('.pkl').name}")
+    return CompiledForest.from_sklearn(joblib.load(path.with_suffix(".pkl")))
+
+
+MODEL_LOADERS = {
+    "keras": _load_keras,
+    "sklearn": _load_sklearn,
+    "forest": _load_forest,
+    "tflite": _load_tflite,
+}
+
+
+def predict_proba(artifacts, X_scaled):
+    """
+    Class probabilities for a scaled feature matrix, one row per sample.
+    """
+    return np.asarray(artifacts.model.predict_proba(X_scaled))
+
+
+def predict_classes(artifacts, y_proba):
+    """
+    Encoded class labels for a probability matrix, as the model's own predict would return them.
+    Neural networks have no classes_, their labels are the argmax indices.
+    """
+    indices = np.argmax(y_proba, axis=1)
+    classes = getattr(artifacts.model, "classes_", None)
+    return indices if classes is None else classes.take(indices)
+
+
+class ModelRegistry:
+    """
+    Loads the model, scaler and label encoder of each target ("pod" or "node")
+    on first use and keeps them until a newer version is swapped in.
+    
+    New versions are detected by polling the artifacts' modification times, or
+    the manifest when one exists, and are loaded and warmed up in a background
+    thread. They only become visible to get() when swap() is called, so the
+    collector can switch models between two cycles without a collection gap.
+    
+    Args:
+        model_type (str): "nn" or "rf"
+        model_path (Path): Directory holding the model artifacts
+        manifest (str): Manifest file name inside model_path, used when it exists
+    """
+    
+    def __init__(self, model_type=MODEL_TYPE, model_path=MODEL_PATH, manifest=MODEL_MANIFEST):
+        self.model_type = model_type
+        self.model_path = Path(model_path)
+        self.manifest_path = self.model_path / manifest if manifest else None
+        self.load_seconds = {}
+        self._artifacts = {}
+        self._pending = {}
+        self._candidates = {}
+        self._loading = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher = None
+    
+    def get(self, target):
+        """
+        Return the artifacts of a target, loading them on first use.
+        
+        Raises:
+            LookupError: If no model of the configured type exists for the target
+        """
+        artifacts = self._artifacts.get(target)
+        if artifacts is None:
+            with self._lock:
+                artifacts = self._artifacts.get(target)
+                if artifacts is None:
+                    artifacts = self._load(target, *self._resolve(target))
+                    self._artifacts = {**self._artifacts, target: artifacts}
+        return artifacts
+    
+    def versions(self):
+        """Version of the artifacts currently served per target."""
+        return {target: artifacts.version for target, artifacts in self._artifacts.items()}
+    
+    def warm_up(self, targets=("pod", "node")):
+        """
+        Load the models of the given targets now and run one dummy prediction each,
+        so the first polling cycle does not pay the cold start.
+        
+        Returns:
+            dict: Seconds spent per target; targets without a model are skipped
+        """
+        timings = {}
+        for target in targets:
+            start = time.perf_counter()
+            try:
+                artifacts = self.get(target)
+            except LookupError as e:
+                print(f"Skipping warm-up: {e}")
+                continue
+            self._warm(artifacts)
+            timings[target] = time.perf_counter() - start
+        return timings
+    
+    def check_for_updates(self):
+        """
+        Start a background load for every served target whose artifacts changed on disk.
+        
+        A new version is only loaded once it has been seen unchanged by two
+        consecutive checks, so files still being copied are not picked up.
+        
+        Returns:
+            list: Targets for which a load was started
+        """
+        started = []
+        for target, current in list(self._artifacts.items()):
+            try:
+                files, version = self._resolve(target)
+            except (LookupError, OSError, ValueError) as e:
+                print(f"Error checking {target} model for updates: {e}")
+                continue
+            pending = self._pending.get(target)
+            if version == current.version or (pending is not None and pending.version == version):
+                self._candidates.pop(target, None)
+                continue
+            if self._candidates.get(target) != version:
+                self._candidates[target] = version
+                continue
+            with self._lock:
+                if target in self._loading:
+                    continue
+                self._loading.add(target)
+            threading.Thread(
+                target=self._load_pending, args=(target, files, version),
+                name=f"model-loader-{target}", daemon=True
+            ).start()
+            started.append(target)
+        return started
+    
+    def swap(self):
+        """
+        Atomically replace the served artifacts with the versions loaded in the background.
+        Call it between cycles so every prediction of a cycle uses the same model.
+        
+        Returns:
+            dict: New version per swapped target, empty if nothing was pending
+        """
+        with self._lock:
+            if not self._pending:
+                return {}
+            pending, self._pending = self._pending, {}
+            self._artifacts = {**self._artifacts, **pending}
+        return {target: artifacts.version for target, artifacts in pending.items()}
+    
+    def start_watcher(self, interval):
+        """
+        Check for new model versions every interval seconds in a daemon thread.
+        """
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="model-watcher", daemon=True)
+        self._watcher.start()
+    
+    def stop_watcher(self):
+        self._stop.set()
+    
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            self.check_for_updates()
+    
+    def _load_pending(self, target, files, version):
+        try:
+            artifacts = self._load(target, files, version)
+            self._warm(artifacts)
+            with self._lock:
+                self._pending[target] = artifacts
+        except Exception as e:
+            # Keep serving the current version; the load is retried on the next check
+            self._candidates.pop(target, None)
+            print(f"Error loading {target} model version {version}: {e}")
+        finally:
+            with self._lock:
+                self._loading.discard(target)
+    
+    def _warm(self, artifacts):
+        predict_proba(artifacts, np.zeros((1, artifacts.scaler.n_features_in_)))
+    
+    def _manifest(self):
+        """Parsed manifest, or None when there is none."""
+        if self.manifest_path is None or not self.manifest_path.exists():
+            return None
+        with open(self.manifest_path) as f:
+            return json.load(f)
+    
+    def _resolve(self, target):
+        """
+        Artifact files and version of the target's model as currently on disk.
+        
+        Returns:
+            tuple: ((backend, model file, scaler file, label encoder file), version)
+        """
+        manifest = self._manifest()
+        files = None
+        if manifest is not None:
+            files = manifest.get("models", {}).get(self.model_type, {}).get(target)
+        if files is not None:
+            files = tuple(files)
+            if manifest.get("version"):
+                return files, f"{self.model_type}:{manifest['version']}"
+            return files, self._version(*files[1:])
+        files = MODEL_ARTIFACTS.get(self.model_type, {}).get(target)
+        if files is None:
+            raise LookupError(f"No '{self.model_type}' model available for {target}s")
+        return files, self._version(*files[1:])
+    
+    def _load(self, target, files, version):
+        backend, model_file, scaler_file, label_encoder_file = files
+        
+        start = time.perf_counter()
+        artifacts = ModelArtifacts(
+            backend=backend,
+            model=MODEL_LOADERS[backend](self.model_path / model_file),
+            scaler=joblib.load(self.model_path / scaler_file),
+            label_encoder=joblib.load(self.model_path / label_encoder_file),
+            version=version
+        )
+        self.load_seconds[target] = time.perf_counter() - start
+        print(f"Loaded {self.model_type} {target} model {version} in {self.load_seconds[target]:.2f}s")
+        return artifacts
+    
+    def _version(self, *files):
+        """Version string of a set of artifacts: model type, model file and latest modification time."""
+        mtimes = [(self.model_path / name).stat().st_mtime_ns
+                  for name in files if (self.model_path / name).exists()]
+        return f"{self.model_type}:{files[0]}:{max(mtimes, default=0)}"
+
+
+# Shared registry used by the predictor
+registry = ModelRegistry()
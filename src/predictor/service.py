@@ -0,0 +1,275 @@
+"""
+Inference service holding the prediction models once for several processes.
+
+The server listens on a local Unix socket and answers batched prediction
+requests from any number of collectors and the API, each connection on its own
+thread. Clients set INFERENCE_SOCKET to the same path and predict_pods_batch /
+predict_nodes_batch send their documents to the server instead of loading the
+models in-process.
+
+Requests are pickled, so only processes of the same user may connect: the
+socket lives in a directory only that user can open and is itself 0600, and
+clients must present the authkey. Without INFERENCE_AUTHKEY the server
+generates a random key and writes it to ``<socket>.key`` (0600), where
+clients of the same user read it.
+
+Run it from src/:
+
+    python3 -m predictor.service [socket path]
+"""
+
+import os
+import pickle
+import secrets
+import socket
+import sys
+import tempfile
+import threading
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+
+from config.settings import (
+    INFERENCE_SOCKET, INFERENCE_AUTHKEY, INFERENCE_TIMEOUT,
+    MODEL_WARMUP, MODEL_RELOAD_INTERVAL
+)
+
+SOCKET_NAME = "kubeboom-inference.sock"
+
+
+def default_socket_path():
+    """Socket path in $XDG_RUNTIME_DIR, or in a per-user directory under the temp dir."""
+    directory = os.environ.get("XDG_RUNTIME_DIR") or os.path.join(tempfile.gettempdir(), f"kubeboom-{os.getuid()}")
+    return os.path.join(directory, SOCKET_NAME)
+
+
+def key_path(address):
+    """File holding the generated authkey of the server at address."""
+    return f"{address}.key"
+
+
+def read_authkey(address):
+    """
+    Authkey generated by the server at address.
+
+    Raises:
+        OSError: If the key file does not exist or cannot be read
+    """
+    with open(key_path(address), "rb") as f:
+        return f.read().strip()
+
+
+def ensure_private_directory(path):
+    """
+    Create path with mode 0700 if needed and check that no other user can use it.
+
+    Raises:
+        PermissionError: If the directory belongs to another user or is open to others
+    """
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    info = os.stat(path)
+    if info.st_uid != os.getuid() or info.st_mode & 0o077:
+        raise PermissionError(
+            f"Socket directory {path} must belong to this user and not be accessible to others (chmod 700)"
+        )
+
+
+class InferenceClient:
+    """
+    Sends prediction batches to the inference service.
+
+    Each thread keeps its own connection, opened on first use and reopened
+    once if the server restarted in between.
+
+    Args:
+        address (str): Path of the server's Unix socket
+        authkey (bytes): Shared secret of the server; empty reads the key the server generated
+        timeout (float): Seconds to wait for an answer
+    """
+
+    def __init__(self, address, authkey=INFERENCE_AUTHKEY, timeout=INFERENCE_TIMEOUT):
+        self.address = address
+        self.authkey = authkey
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def predict(self, target, docs):
+        """
+        Predict a batch of documents on the server.
+
+        Args:
+            target (str): "pod" or "node"
+            docs (list): Feature documents
+
+        Returns:
+            list: Annotated documents, as returned by predict_pods_batch / predict_nodes_batch
+
+        Raises:
+            OSError: If the server cannot be reached
+            TimeoutError: If the server does not answer within the timeout
+            AuthenticationError: If the server rejects the authkey
+            pickle.UnpicklingError: If the answer cannot be decoded
+            RuntimeError: If the server failed to handle the request
+        """
+        return self._request("predict", target, docs)
+
+    def versions(self):
+        """Model versions currently served, per target."""
+        return self._request("versions")
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _request(self, *message):
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.send(message)
+                if not conn.poll(self.timeout):
+                    self.close()
+                    raise TimeoutError(f"Inference service did not answer within {self.timeout}s")
+                status, payload = conn.recv()
+                break
+            except (EOFError, BrokenPipeError, ConnectionResetError):
+                # Stale connection from before a server restart
+                self.close()
+                if attempt:
+                    raise ConnectionError(f"Lost connection to inference service at {self.address}")
+            except pickle.UnpicklingError:
+                # The rest of the stream cannot be trusted
+                self.close()
+                raise
+        if status == "error":
+            raise RuntimeError(payload)
+        return payload
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            authkey = self.authkey or read_authkey(self.address)
+            conn = Client(self.address, family="AF_UNIX", authkey=authkey)
+            self._local.conn = conn
+        return conn
+
+
+class InferenceServer:
+    """
+    Serves predictions from one set of models over a Unix socket.
+
+    Models loaded in the background by the registry are swapped in before a
+    request is handled, so every batch is predicted by a single model version.
+
+    Args:
+        address (str): Path of the Unix socket to listen on; its directory must be private
+        authkey (bytes): Shared secret clients must present; empty generates one
+    """
+
+    def __init__(self, address=None, authkey=INFERENCE_AUTHKEY):
+        self.address = address or default_socket_path()
+        self.authkey = authkey
+        self._listener = None
+        self._swap_lock = threading.Lock()
+
+    def serve_forever(self):
+        from predictor.registry import registry
+
+        if MODEL_WARMUP:
+            timings = registry.warm_up()
+            print("Warmed up models: " + ", ".join(f"{target} {seconds:.2f}s" for target, seconds in timings.items()))
+        if MODEL_RELOAD_INTERVAL > 0:
+            registry.start_watcher(MODEL_RELOAD_INTERVAL)
+
+        ensure_private_directory(os.path.dirname(os.path.abspath(self.address)))
+        self._remove_stale_socket()
+        if not self.authkey:
+            self.authkey = self._write_authkey()
+        self._listener = Listener(self.address, family="AF_UNIX", authkey=self.authkey)
+        os.chmod(self.address, 0o600)
+        print(f"Inference service listening on {self.address}")
+
+        while True:
+            try:
+                conn = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError) as e:
+                if self._listener is None:
+                    break
+                print(f"Rejected inference client: {e}")
+                continue
+            threading.Thread(target=self._handle, args=(conn,), name="inference-client", daemon=True).start()
+
+    def shutdown(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+
+    def _remove_stale_socket(self):
+        """
+        Remove a socket file left by a server that is no longer running.
+
+        Raises:
+            RuntimeError: If another server is still listening on the socket
+        """
+        if not os.path.exists(self.address):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.address)
+        except (ConnectionRefusedError, FileNotFoundError):
+            os.remove(self.address)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f"An inference service is already listening on {self.address}")
+
+    def _write_authkey(self):
+        authkey = secrets.token_hex(32).encode()
+        path = key_path(self.address)
+        if os.path.exists(path):
+            os.remove(path)
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(authkey)
+        return authkey
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    result = ("ok", self._dispatch(*message))
+                except Exception as e:
+                    result = ("error", str(e))
+                try:
+                    conn.send(result)
+                except OSError:
+                    # Client gave up waiting
+                    return
+
+    def _dispatch(self, op, *args):
+        # Imported here: the predictor itself uses InferenceClient
+        from predictor.predictor import predict_local, swap_models, registry
+
+        if op == "predict":
+            with self._swap_lock:
+                for target, version in swap_models().items():
+                    print(f"Switched {target} model to {version}")
+            return predict_local(*args)
+        if op == "versions":
+            return registry.versions()
+        raise ValueError(f"Unknown inference request '{op}'")
+
+
+if __name__ == "__main__":
+    address = sys.argv[1] if len(sys.argv) > 1 else INFERENCE_SOCKET or default_socket_path()
+    server = InferenceServer(address)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Inference service stopped by user.")
+    finally:
+        server.shutdown()
@@ -0,0 +1,139 @@
+"""
+One-off migration of metrics collections written before provisioning.
+
+Older collectors stored pod_metrics and node_metrics as plain collections
+with string timestamps and no metaField, so the dashboard's meta.* filters and
+datetime windows match none of those rows. On MongoDB 5.0+ a plain collection
+is renamed to ``<name>_legacy``, the time-series collection is provisioned in
+its place and the documents are copied over with a BSON date timestamp and the
+metaField; the legacy collection is kept until you drop it. Older servers have
+no time-series collections, so the documents are fixed in place.
+
+Stop the collector first, then run it from src/ (or ``make migrate-metrics``):
+
+    python3 -m storage.migrate
+
+A migration that was interrupted continues where it stopped.
+"""
+
+from pymongo import MongoClient, UpdateOne
+
+from config.settings import MONGO_URI, MONGO_DB_NAME, MONGO_BATCH_SIZE
+from storage.mongo_exporter import METRICS_COLLECTIONS, META_FIELD, prepare_metrics_document, provision_metrics_collections
+
+# Collection holding the last _id copied per migrated collection
+MIGRATION_STATE = "migration_state"
+
+
+def legacy_collection_name(name):
+    return f"{name}_legacy"
+
+
+def server_has_timeseries(db):
+    """Time-series collections need MongoDB 5.0."""
+    version = tuple(db.client.server_info().get("versionArray", [0]))
+    return version >= (5, 0)
+
+
+def migrate_metrics_collection(db, name, batch_size=MONGO_BATCH_SIZE):
+    """
+    Bring the documents of a plain metrics collection to the layout the
+    exporter writes: BSON date timestamp and the series metaField.
+
+    Args:
+        db: pymongo Database
+        name (str): Key of METRICS_COLLECTIONS
+        batch_size (int): Documents read and written at once
+
+    Returns:
+        int: Documents migrated by this call
+    """
+    existing = {info["name"]: info for info in db.list_collections()}
+    legacy = legacy_collection_name(name)
+    if legacy not in existing:
+        info = existing.get(name)
+        if info is None or info.get("type") == "timeseries":
+            return 0
+        if not server_has_timeseries(db):
+            return _fix_in_place(db, name, batch_size)
+        # Time-series collections cannot be renamed, so the plain one makes room
+        db[name].rename(legacy)
+    provision_metrics_collections(db)
+    return _copy(db, legacy, name, batch_size)
+
+
+def _copy(db, legacy, name, batch_size):
+    state = db[MIGRATION_STATE].find_one({"_id": name})
+    last_id = state["last_id"] if state else None
+    resumed = last_id is not None
+    copied = 0
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        docs = list(db[legacy].find(query).sort("_id", 1).limit(batch_size))
+        if not docs:
+            return copied
+        prepared = _prepare(docs, name)
+        if resumed:
+            # The batch after an interruption may already have been inserted
+            ids = [doc["_id"] for doc in prepared]
+            written = {doc["_id"] for doc in db[name].find({"_id": {"$in": ids}}, {"_id": 1})}
+            prepared = [doc for doc in prepared if doc["_id"] not in written]
+            resumed = False
+        if prepared:
+            db[name].insert_many(prepared, ordered=False)
+        copied += len(prepared)
+        last_id = docs[-1]["_id"]
+        db[MIGRATION_STATE].update_one({"_id": name}, {"$set": {"last_id": last_id}}, upsert=True)
+        print(f"Copied {copied} documents from '{legacy}' to '{name}'")
+
+
+def _fix_in_place(db, name, batch_size):
+    collection = db[name]
+    query = {"$or": [{META_FIELD: {"$exists": False}}, {"timestamp": {"$not": {"$type": "date"}}}]}
+    fixed = 0
+    skipped = set()
+    while True:
+        docs = list(collection.find({**query, "_id": {"$nin": list(skipped)}}).limit(batch_size))
+        if not docs:
+            return fixed
+        prepared = _prepare(docs, name)
+        skipped.update({doc["_id"] for doc in docs} - {doc["_id"] for doc in prepared})
+        if prepared:
+            collection.bulk_write([
+                UpdateOne({"_id": doc["_id"]}, {"$set": {"timestamp": doc["timestamp"], META_FIELD: doc[META_FIELD]}})
+                for doc in prepared
+            ], ordered=False)
+        fixed += len(prepared)
+        print(f"Fixed {fixed} documents of '{name}'")
+
+
+def _prepare(docs, name):
+    """Migrated copies of the documents; rows whose timestamp cannot be parsed are left out."""
+    prepared = []
+    for doc in docs:
+        try:
+            if doc.get("timestamp") is None:
+                # The exporter would stamp it with the current time
+                raise ValueError("no timestamp")
+            prepared.append(prepare_metrics_document(doc, name))
+        except (ValueError, TypeError) as e:
+            print(f"Skipping document {doc['_id']} of '{name}' with timestamp {doc.get('timestamp')!r}: {e}")
+    return prepared
+
+
+def main():
+    # Dates already stored as BSON dates come back as UTC instead of naive local times
+    client = MongoClient(MONGO_URI, tz_aware=True)
+    db = client[MONGO_DB_NAME]
+    try:
+        for name in METRICS_COLLECTIONS:
+            migrated = migrate_metrics_collection(db, name)
+            print(f"'{name}': {migrated} documents migrated")
+            if legacy_collection_name(name) in db.list_collection_names():
+                print(f"Check the dashboard, then drop '{legacy_collection_name(name)}'")
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,145 @@
-from pymongo import MongoClient
-from config.settings import MONGO_URI, MONGO_DB_NAME
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import pandas as pd
+from pymongo import ASCENDING, DESCENDING, MongoClient
+from pymongo.errors import BulkWriteError, OperationFailure, PyMongoError
+from core.metrics import EXPORT_DROPPED, EXPORT_RETRIES, count_exported
+from config.settings import (
+    MONGO_URI, MONGO_DB_NAME, MONGO_RETENTION_DAYS,
+    MONGO_BATCH_SIZE, MONGO_MAX_LATENCY, MONGO_QUEUE_MAX, MONGO_RETRY_MAX_BACKOFF
+)
+
+# Write error code of a document whose _id was already inserted by an earlier attempt
+DUPLICATE_KEY = 11000
+
+# Metrics collections and the fields identifying a series, copied into the
+# time-series metaField so MongoDB buckets and prunes by object
+METRICS_COLLECTIONS = {
+    "pod_metrics": ("namespace", "pod", "node"),
+    "node_metrics": ("node_name",),
+    "deployment_metrics": ("namespace", "deployment"),
+}
+META_FIELD = "meta"
+
+# Compound indexes matching the dashboard filters, newest first
+METRICS_INDEXES = {
+    "pod_metrics": [
+        [("meta.namespace", ASCENDING), ("meta.pod", ASCENDING), ("timestamp", DESCENDING)],
+        [("meta.pod", ASCENDING), ("timestamp", DESCENDING)],
+    ],
+    "node_metrics": [
+        [("meta.node_name", ASCENDING), ("timestamp", DESCENDING)],
+    ],
+    "deployment_metrics": [
+        [("meta.namespace", ASCENDING), ("meta.deployment", ASCENDING), ("timestamp", DESCENDING)],
+    ],
+}
+
+
+def to_bson_date(value):
+    """
+    UTC datetime for a collector timestamp, stored by MongoDB as a BSON date.
+    Naive timestamps are in the collector's local time, like pd.Timestamp.now().
+    """
+    if value is None:
+        return datetime.now(timezone.utc)
+    ts = pd.Timestamp(value)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize(datetime.now().astimezone().tzinfo)
+    return ts.tz_convert("UTC").to_pydatetime()
+
+
+def prepare_metrics_document(doc, collection_name):
+    """
+    Copy of a metrics row with a BSON date timestamp and the series metaField.
+    Other collections are stored as they are.
+    """
+    meta_fields = METRICS_COLLECTIONS.get(collection_name)
+    if meta_fields is None:
+        return doc
+    prepared = dict(doc)
+    prepared["timestamp"] = to_bson_date(doc.get("timestamp"))
+    prepared[META_FIELD] = {field: doc.get(field) for field in meta_fields}
+    return prepared
+
+
+def provision_metrics_collections(db, retention_days=MONGO_RETENTION_DAYS):
+    """
+    Create the metrics collections as time-series collections with a retention
+    TTL and the dashboard indexes. Safe to run at every startup: existing
+    collections only get their TTL and missing indexes updated.
+    
+    Args:
+        db: pymongo Database
+        retention_days (float): Days documents are kept, 0 keeps them forever
+        
+    Returns:
+        dict: "timeseries" or "plain" per collection
+    """
+    ttl_seconds = int(retention_days * 86400) if retention_days else None
+    existing = {info["name"]: info for info in db.list_collections()}
+    kinds = {}
+    for name in METRICS_COLLECTIONS:
+        info = existing.get(name)
+        if info is None:
+            try:
+                options = {"timeseries": {"timeField": "timestamp", "metaField": META_FIELD, "granularity": "seconds"}}
+                if ttl_seconds:
+                    options["expireAfterSeconds"] = ttl_seconds
+                db.create_collection(name, **options)
+                kinds[name] = "timeseries"
+            except OperationFailure as e:
+                # MongoDB before 5.0 has no time-series collections
+                print(f"Creating '{name}' as a plain collection: {e}")
+                db.create_collection(name)
+                kinds[name] = "plain"
+        else:
+            kinds[name] = "timeseries" if info.get("type") == "timeseries" else "plain"
+
+        if kinds[name] == "timeseries":
+            if info is not None and info.get("options", {}).get("expireAfterSeconds") != ttl_seconds:
+                db.command("collMod", name, expireAfterSeconds=ttl_seconds or "off")
+        else:
+            if info is not None:
+                print(f"'{name}' is a plain collection created before provisioning; "
+                      "run `make migrate-metrics` so the dashboard filters and the TTL cover its older rows")
+            _ensure_ttl_index(db[name], ttl_seconds)
+
+        for keys in METRICS_INDEXES.get(name, []):
+            db[name].create_index(keys)
+    return kinds
+
+
+def _ensure_ttl_index(collection, ttl_seconds):
+    indexes = collection.index_information()
+    ttl_index = indexes.get("timestamp_ttl")
+    if ttl_index is not None and ttl_index.get("expireAfterSeconds") == ttl_seconds:
+        return
+    if ttl_index is not None:
+        collection.drop_index("timestamp_ttl")
+    if ttl_seconds:
+        collection.create_index([("timestamp", ASCENDING)], name="timestamp_ttl", expireAfterSeconds=ttl_seconds)
+    else:
+        collection.create_index([("timestamp", ASCENDING)], name="timestamp_ttl")
+
 
 class MongoExporter:
     def __init__(self):
         self.client = MongoClient(MONGO_URI)
         self.db = self.client[MONGO_DB_NAME]
 
+    def provision(self):
+        """Create the metrics collections, their indexes and retention TTL if needed."""
+        return provision_metrics_collections(self.db)
+
     def save_to_mongo(self, data, collection_name):
         if data:
             collection = self.db[collection_name]
-            collection.insert_many(data)
+            collection.insert_many([prepare_metrics_document(doc, collection_name) for doc in data])
+            count_exported(collection_name, len(data))
             return f"Saved {len(data)} documents to MongoDB collection '{collection_name}'"
         return "No data to save."
 
@@ -19,3 +149,196 @@ class MongoExporter:
         if result.matched_count > 0:
             return "Update successful"
         return "No matching document found"
+
+    def close(self):
+        self.client.close()
+
+
+class WriteBehindMongoExporter(MongoExporter):
+    """
+    MongoExporter whose save_to_mongo only queues the documents.
+
+    A background thread writes them with unordered bulk inserts once
+    ``batch_size`` documents are queued or the oldest one has waited
+    ``max_latency`` seconds. Failed batches are retried with exponential
+    backoff while new documents keep queueing; beyond ``max_queue`` documents
+    the oldest are dropped, so the caller never waits on the database.
+
+    Args:
+        batch_size (int): Documents per bulk write
+        max_latency (float): Seconds a document may wait before its batch is written
+        max_queue (int): Documents kept in memory while MongoDB is unavailable
+        max_backoff (float): Upper bound of the retry delay in seconds
+    """
+
+    def __init__(self, batch_size=MONGO_BATCH_SIZE, max_latency=MONGO_MAX_LATENCY,
+                 max_queue=MONGO_QUEUE_MAX, max_backoff=MONGO_RETRY_MAX_BACKOFF):
+        super().__init__()
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.max_queue = max_queue
+        self.max_backoff = max_backoff
+        self.written = 0
+        self.dropped = 0
+        self.retries = 0
+        # (queued at, collection name, document)
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._stopping = False
+        # Timestamp of the oldest row in the batch being written
+        self._writing_since = None
+        self._writer = threading.Thread(target=self._run, name="mongo-writer", daemon=True)
+        self._writer.start()
+
+    def save_to_mongo(self, data, collection_name):
+        """
+        Queue documents for the background writer.
+
+        Returns:
+            str: Summary including the current queue depth
+        """
+        if not data:
+            return "No data to save."
+        now = time.monotonic()
+        with self._cond:
+            self._queue.extend((now, collection_name, doc) for doc in data)
+            overflow = len(self._queue) - self.max_queue
+            for _ in range(max(0, overflow)):
+                self._queue.popleft()
+            if overflow > 0:
+                self.dropped += overflow
+                EXPORT_DROPPED.inc(overflow)
+            depth = len(self._queue)
+            self._cond.notify()
+        if overflow > 0:
+            print(f"MongoDB write queue full, dropped the {overflow} oldest documents")
+        return f"Queued {len(data)} documents for MongoDB collection '{collection_name}' ({depth} waiting)"
+
+    def queue_depth(self):
+        """Documents waiting to be written."""
+        return len(self._queue)
+
+    def oldest_pending(self):
+        """
+        UTC timestamp of the oldest row queued or being written, None if all are written.
+        """
+        with self._cond:
+            candidates = [self._writing_since] if self._writing_since is not None else []
+            if self._queue:
+                candidates.append(to_bson_date(self._queue[0][2].get("timestamp")))
+        return min(candidates) if candidates else None
+
+    def stats(self):
+        return {
+            "queued": self.queue_depth(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "retries": self.retries,
+        }
+
+    def close(self, timeout=30):
+        """Write what is still queued, then stop the writer and close the client."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        self._writer.join(timeout)
+        if self._queue:
+            print(f"Closing MongoDB exporter with {len(self._queue)} documents unwritten")
+        super().close()
+
+    def _next_batch(self):
+        """Wait until a batch is due and take it off the queue; None once stopped and drained."""
+        with self._cond:
+            while True:
+                if self._queue:
+                    waited = time.monotonic() - self._queue[0][0]
+                    if self._stopping or len(self._queue) >= self.batch_size or waited >= self.max_latency:
+                        count = min(self.batch_size, len(self._queue))
+                        return [self._queue.popleft() for _ in range(count)]
+                    self._cond.wait(self.max_latency - waited)
+                elif self._stopping:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def _unwritten(self, collection_name, docs):
+        """
+        Documents of a failed batch that did not reach the collection.
+
+        insert_many gives every document its _id before sending it, so a retry
+        resends the same _ids. Time-series collections do not reject duplicate
+        _ids, so the ones a failed attempt wrote anyway are looked up (within
+        the batch's time range) and left out instead of being inserted twice.
+        """
+        ids = [doc["_id"] for doc in docs if "_id" in doc]
+        if not ids:
+            return docs
+        query = {"_id": {"$in": ids}}
+        timestamps = [doc["timestamp"] for doc in docs if isinstance(doc.get("timestamp"), datetime)]
+        if timestamps:
+            query["timestamp"] = {"$gte": min(timestamps), "$lte": max(timestamps)}
+        existing = {doc["_id"] for doc in self.db[collection_name].find(query, {"_id": 1})}
+        self._count_written(collection_name, len(existing))
+        return [doc for doc in docs if doc.get("_id") not in existing]
+
+    def _count_written(self, collection_name, count):
+        self.written += count
+        count_exported(collection_name, count)
+
+    def _count_dropped(self, count):
+        self.dropped += count
+        EXPORT_DROPPED.inc(count)
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            by_collection = {}
+            for _, collection_name, doc in batch:
+                by_collection.setdefault(collection_name, []).append(prepare_metrics_document(doc, collection_name))
+            timestamps = [doc["timestamp"] for docs in by_collection.values() for doc in docs
+                          if isinstance(doc.get("timestamp"), datetime)]
+            with self._cond:
+                self._writing_since = min(timestamps) if timestamps else None
+            for collection_name, docs in by_collection.items():
+                self._write(collection_name, docs)
+            with self._cond:
+                self._writing_since = None
+
+    def _write(self, collection_name, docs):
+        delay = 0.5
+        retrying = False
+        while True:
+            try:
+                if retrying:
+                    docs = self._unwritten(collection_name, docs)
+                    if not docs:
+                        return
+                self.db[collection_name].insert_many(docs, ordered=False)
+                self._count_written(collection_name, len(docs))
+                return
+            except BulkWriteError as e:
+                errors = e.details.get("writeErrors", [])
+                failed = [error for error in errors if error.get("code") != DUPLICATE_KEY]
+                if not e.details.get("writeConcernErrors"):
+                    # Duplicates were written by an earlier attempt; other write errors will not go away
+                    self._count_written(collection_name, len(docs) - len(failed))
+                    if failed:
+                        self._count_dropped(len(failed))
+                        print(f"Dropped {len(failed)} documents rejected by '{collection_name}': {failed[0].get('errmsg')}")
+                    return
+                error = e
+            except PyMongoError as e:
+                error = e
+            if self._stopping and delay >= self.max_backoff:
+                # Shutting down and MongoDB is still unavailable
+                self._count_dropped(len(docs))
+                print(f"Giving up on {len(docs)} documents for '{collection_name}': {error}")
+                return
+            self.retries += 1
+            EXPORT_RETRIES.inc()
+            retrying = True
+            print(f"Error writing to MongoDB collection '{collection_name}', retrying in {delay:.1f}s: {error}")
+            time.sleep(delay)
+            delay = min(delay * 2, self.max_backoff)
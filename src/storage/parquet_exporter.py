@@ -0,0 +1,253 @@
+import os
+import threading
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from core.metrics import EXPORT_DROPPED, count_exported
+from config.settings import (
+    POD_ERROR_TYPES, NODE_ERROR_TYPES,
+    PARQUET_DIR, PARQUET_PARTITION, PARQUET_FLUSH_ROWS, PARQUET_FLUSH_SECONDS, PARQUET_COMPRESSION,
+    PARQUET_MAX_BUFFERED_ROWS
+)
+
+# Columns holding names and labels. Every other column except the timestamp
+# and the error flags is stored as float64 unless it holds text, so a column
+# keeps the same type in every file even when a cycle only saw integer values
+# or no value at all
+STRING_COLUMNS = {
+    "namespace", "pod", "node", "node_name", "deployment",
+    "predicted_label", "model_version", "label", "status_label", "error"
+}
+FLAG_COLUMNS = set(POD_ERROR_TYPES) | set(NODE_ERROR_TYPES)
+
+PARTITION_FORMATS = {
+    "hour": {"date": "%Y-%m-%d", "hour": "%H"},
+    "day": {"date": "%Y-%m-%d"},
+}
+
+
+def column_type(name, values):
+    """Arrow type a metrics column is stored with."""
+    if name == "timestamp":
+        return pa.timestamp("ms")
+    if name in STRING_COLUMNS:
+        return pa.string()
+    if name in FLAG_COLUMNS:
+        return pa.int8()
+    if not pd.api.types.is_numeric_dtype(values) and pd.to_numeric(values.dropna(), errors="coerce").isna().any():
+        return pa.string()
+    return pa.float64()
+
+
+def partition_schema(partition=PARQUET_PARTITION):
+    """Partition columns of a metrics dataset: date=YYYY-MM-DD[/hour=HH]."""
+    fields = [("date", pa.string())]
+    if partition == "hour":
+        fields.append(("hour", pa.int8()))
+    return pa.schema(fields)
+
+
+class ParquetExporter:
+    """Class for exporting metrics data to time-partitioned Parquet datasets for nodes and pods."""
+
+    def __init__(self, data_dir=PARQUET_DIR, partition=PARQUET_PARTITION, flush_rows=PARQUET_FLUSH_ROWS,
+                 flush_seconds=PARQUET_FLUSH_SECONDS, compression=PARQUET_COMPRESSION,
+                 max_buffered_rows=PARQUET_MAX_BUFFERED_ROWS):
+        """
+        Initialize the Parquet exporter.
+
+        Rows are buffered in memory per dataset and written as one compressed
+        file per partition once ``flush_rows`` rows are buffered or the oldest
+        buffered row is ``flush_seconds`` old. Rows whose file cannot be written
+        go back to the buffer, of which the newest ``max_buffered_rows`` are kept.
+
+        Args:
+            data_dir (str): Directory holding one dataset directory per collection
+            partition (str): "hour" or "day"
+            flush_rows (int): Buffered rows that trigger a flush
+            flush_seconds (int): Age of the oldest buffered row that triggers a flush
+            compression (str): Parquet codec, e.g. "zstd" or "snappy"
+            max_buffered_rows (int): Rows kept per dataset while writes fail
+        """
+        if partition not in PARTITION_FORMATS:
+            raise ValueError(f"Unsupported partition '{partition}', use 'hour' or 'day'")
+        self.data_dir = data_dir
+        self.partition = partition
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.compression = compression
+        self.max_buffered_rows = max_buffered_rows
+        self._buffers = {}
+        self._buffered_since = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.data_dir, exist_ok=True)
+
+    def save_to_parquet(self, data, dataset="pod_metrics"):
+        """
+        Buffer metrics rows and flush the dataset if its buffer is full or old enough.
+
+        Args:
+            data (list): List of metric dictionaries
+            dataset (str): Name of the dataset directory
+
+        Returns:
+            str: Summary of what was buffered and written
+        """
+        if not data:
+            return "No data to save."
+        with self._lock:
+            self._buffers.setdefault(dataset, []).extend(data)
+            self._buffered_since.setdefault(dataset, time.monotonic())
+            buffered = len(self._buffers[dataset])
+            due = (buffered >= self.flush_rows
+                   or time.monotonic() - self._buffered_since[dataset] >= self.flush_seconds)
+        if due:
+            files = self.flush(dataset)
+            with self._lock:
+                kept = len(self._buffers.get(dataset, []))
+            if kept:
+                return f"Wrote {len(files)} file(s) in '{dataset}', {kept} rows kept for the next flush"
+            return f"Wrote {buffered} rows to {len(files)} file(s) in '{dataset}'"
+        return f"Buffered {len(data)} rows for '{dataset}' ({buffered} pending)"
+
+    def flush(self, dataset=None):
+        """
+        Write the buffered rows of one dataset, or of all of them.
+
+        Returns:
+            list: Paths of the files written
+        """
+        with self._lock:
+            names = [dataset] if dataset is not None else list(self._buffers)
+            pending = {name: (self._buffers.pop(name, []), self._buffered_since.pop(name, None)) for name in names}
+
+        files = []
+        for name, (rows, since) in pending.items():
+            if not rows:
+                continue
+            written = set()
+            try:
+                for path, positions in self._write(name, rows):
+                    files.append(path)
+                    written.update(positions)
+                    count_exported(name, len(positions))
+            except Exception as e:
+                unwritten = [row for i, row in enumerate(rows) if i not in written]
+                print(f"Error writing {len(unwritten)} rows to '{name}', keeping them for the next flush: {e}")
+                self._requeue(name, unwritten, since)
+        return files
+
+    def queue_depth(self):
+        """Rows buffered and not written yet."""
+        with self._lock:
+            return sum(len(rows) for rows in self._buffers.values())
+
+    def close(self):
+        """Flush every buffered row."""
+        return self.flush()
+
+    def _requeue(self, dataset, rows, since):
+        """Put rows that were not written back in front of the rows buffered since."""
+        with self._lock:
+            buffer = rows + self._buffers.get(dataset, [])
+            dropped = len(buffer) - self.max_buffered_rows
+            if dropped > 0:
+                buffer = buffer[dropped:]
+                EXPORT_DROPPED.inc(dropped)
+                print(f"Dropped the {dropped} oldest buffered rows of '{dataset}' (limit {self.max_buffered_rows})")
+            self._buffers[dataset] = buffer
+            self._buffered_since[dataset] = min(since, self._buffered_since.get(dataset, since))
+
+    def _write(self, dataset, rows):
+        """Write one file per partition, yielding its path and the positions of its rows."""
+        df = pd.DataFrame(rows)
+        # Rows of a failed prediction carry only an error message
+        timestamps = df["timestamp"] if "timestamp" in df.columns else pd.Series(pd.NaT, index=df.index)
+        df["timestamp"] = pd.to_datetime(timestamps).fillna(pd.Timestamp.now()).dt.floor("ms")
+        schema = pa.schema([(name, column_type(name, df[name])) for name in sorted(df.columns)])
+
+        formats = PARTITION_FORMATS[self.partition]
+        keys = [df["timestamp"].dt.strftime(fmt).rename(field) for field, fmt in formats.items()]
+
+        for values, part in df.groupby(keys, sort=True):
+            values = values if isinstance(values, tuple) else (values,)
+            directory = os.path.join(
+                self.data_dir, dataset,
+                *(f"{field}={value}" for field, value in zip(formats, values))
+            )
+            os.makedirs(directory, exist_ok=True)
+            filename = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.parquet"
+            path = os.path.join(directory, filename)
+            # Written under a hidden name first so readers never see a partial file
+            tmp_path = os.path.join(directory, f".{filename}")
+
+            table = pa.Table.from_pandas(part.sort_values("timestamp"), schema=schema, preserve_index=False)
+            try:
+                pq.write_table(table, tmp_path, compression=self.compression)
+                os.replace(tmp_path, path)
+            except Exception:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            yield path, part.index
+
+
+def read_metrics(path, columns=None, start=None, end=None, partition=PARQUET_PARTITION):
+    """
+    Read a Parquet metrics dataset into a DataFrame.
+
+    Only the requested columns are read, and partitions and row groups outside
+    the time range are skipped without being decoded.
+
+    Args:
+        path (str): Dataset directory (e.g. data/parquet/pod_metrics) or a single .parquet file
+        columns (list): Columns to read, all if None; missing columns are returned as NaN
+        start: Earliest timestamp to include (anything pd.Timestamp accepts)
+        end: Timestamp up to which rows are included (exclusive)
+        partition (str): Partitioning the dataset was written with
+
+    Returns:
+        pd.DataFrame: The selected rows, ordered by timestamp
+    """
+    single_file = str(path).endswith(".parquet")
+    hive = None if single_file else ds.partitioning(partition_schema(partition), flavor="hive")
+    schemas = [fragment.physical_schema
+               for fragment in ds.dataset(path, format="parquet", partitioning=hive).get_fragments()]
+    if not schemas:
+        return pd.DataFrame(columns=columns or [])
+    if not single_file:
+        schemas.append(partition_schema(partition))
+    # Files written at different times may hold different columns; their types always agree
+    schema = pa.unify_schemas(schemas)
+    dataset = ds.dataset(path, format="parquet", schema=schema, partitioning=hive)
+
+    condition = None
+    if start is not None:
+        start = pd.Timestamp(start)
+        condition = ds.field("timestamp") >= pa.scalar(start, pa.timestamp("ms"))
+        if not single_file:
+            # Prunes whole partitions before any file is opened
+            condition &= ds.field("date") >= start.strftime("%Y-%m-%d")
+    if end is not None:
+        end = pd.Timestamp(end)
+        end_condition = ds.field("timestamp") < pa.scalar(end, pa.timestamp("ms"))
+        if not single_file:
+            end_condition &= ds.field("date") <= end.strftime("%Y-%m-%d")
+        condition = end_condition if condition is None else condition & end_condition
+
+    available = [name for name in (columns or schema.names) if name in schema.names]
+    if columns is not None and "timestamp" not in available and "timestamp" in schema.names:
+        read_columns = available + ["timestamp"]
+    else:
+        read_columns = available
+    df = dataset.to_table(columns=read_columns, filter=condition).to_pandas()
+    if "timestamp" in df.columns:
+        df = df.sort_values("timestamp", kind="stable").reset_index(drop=True)
+    if columns is not None:
+        df = df.reindex(columns=columns)
+    return df
@@ -0,0 +1,450 @@
+"""
+Downsampled rollups of the pod and node metrics.
+
+A compactor summarises every closed time bucket of the raw collections into
+``<collection>_1m`` and ``<collection>_1h``: one document per series and
+bucket with the row count, the sum, count, min, max and p95 of every metric
+and the predicted label counts. Long-range chart queries read these tiers
+instead of the raw 5-second rows.
+
+The 1-minute tier is built from the raw rows. The 1-hour tier is built from
+the 1-minute documents, except for p95, which takes one pass over the raw
+rows of each closed hour.
+
+Document layout:
+
+    {"_id": {"meta": {...}, "t": <bucket start>}, "timestamp": <bucket start>,
+     "meta": {...}, "count": 12,
+     "metrics": {"cpu_usage": {"sum": ..., "n": ..., "min": ..., "max": ..., "p95": ...}},
+     "labels": {"Good": 11, "Alert": 1}}
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from pymongo import ASCENDING, ReplaceOne
+from pymongo.errors import PyMongoError
+
+from config.settings import (
+    POD_QUERIES, NODE_QUERIES,
+    ROLLUP_INTERVAL, ROLLUP_LAG, ROLLUP_REWIND, ROLLUP_RETENTION_1M_DAYS, ROLLUP_RETENTION_1H_DAYS
+)
+from storage.mongo_exporter import METRICS_INDEXES, META_FIELD
+
+# Tier name and bucket size in seconds, finest first
+ROLLUP_TIERS = {"1m": 60, "1h": 3600}
+FINEST_TIER = next(iter(ROLLUP_TIERS))
+ROLLUP_RETENTION_DAYS = {"1m": ROLLUP_RETENTION_1M_DAYS, "1h": ROLLUP_RETENTION_1H_DAYS}
+
+# Raw collections that are rolled up and the metrics summarised for each
+ROLLUP_SOURCES = {
+    "pod_metrics": list(POD_QUERIES),
+    "node_metrics": list(NODE_QUERIES),
+}
+LABEL_FIELD = "predicted_label"
+
+# Collection holding how far each tier has been rolled up
+ROLLUP_STATE = "rollup_state"
+
+# Buckets summarised per aggregation while catching up
+CHUNK_BUCKETS = 60
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def rollup_collection_name(source, tier):
+    return f"{source}_{tier}"
+
+
+def bucket_start(bucket_seconds, field="$timestamp"):
+    """
+    Aggregation expression for the start of the bucket a date falls in:
+    the date minus the milliseconds since the last boundary (works without $dateTrunc).
+    """
+    millis = {"$subtract": [field, EPOCH]}
+    return {"$subtract": [field, {"$mod": [millis, bucket_seconds * 1000]}]}
+
+
+def floor_time(value, bucket_seconds):
+    """Start of the bucket a UTC datetime falls in."""
+    millis = int((value - EPOCH).total_seconds() * 1000)
+    return EPOCH + timedelta(milliseconds=millis - millis % (bucket_seconds * 1000))
+
+
+def as_utc(value):
+    """Attach UTC to the naive datetimes returned by a client without tz_aware."""
+    return value if value.tzinfo is not None else value.replace(tzinfo=timezone.utc)
+
+
+def rolled_up_until(db, source, tier):
+    """
+    End of the last bucket written to a tier.
+
+    Returns:
+        datetime: UTC datetime, or None if the tier is empty
+    """
+    state = db[ROLLUP_STATE].find_one({"_id": rollup_collection_name(source, tier)})
+    if state is None:
+        return None
+    return as_utc(state["until"])
+
+
+def server_has_percentile(db):
+    """$percentile needs MongoDB 7.0; older servers return the values and p95 is computed here."""
+    version = tuple(db.client.server_info().get("versionArray", [0]))
+    return version >= (7, 0)
+
+
+def rollup_window(db, source, tier, start, end, native_percentile=False):
+    """
+    Summarise the raw rows in [start, end) into the tier. Buckets already
+    written are replaced, so a window can be rolled up again safely.
+
+    Args:
+        db: pymongo Database
+        source (str): Raw collection, e.g. "pod_metrics"
+        tier (str): Key of ROLLUP_TIERS
+        start (datetime): First bucket start (UTC)
+        end (datetime): End of the last bucket (UTC)
+        native_percentile (bool): Let MongoDB compute p95 with $percentile
+
+    Returns:
+        int: Rollup documents written
+    """
+    bucket_seconds = ROLLUP_TIERS[tier]
+    metrics = ROLLUP_SOURCES[source]
+    raw = db[source]
+    match = {"$match": {"timestamp": {"$gte": start, "$lt": end}}}
+    key = {"meta": f"${META_FIELD}", "t": bucket_start(bucket_seconds)}
+
+    group = {"_id": key, "count": {"$sum": 1}}
+    for i, metric in enumerate(metrics):
+        field = f"${metric}"
+        group[f"sum_{i}"] = {"$sum": field}
+        group[f"n_{i}"] = {"$sum": {"$cond": [{"$isNumber": field}, 1, 0]}}
+        group[f"min_{i}"] = {"$min": field}
+        group[f"max_{i}"] = {"$max": field}
+        group[f"p95_{i}"] = _p95_accumulator(field, native_percentile)
+
+    labels = {}
+    label_pipeline = [match, {"$group": {"_id": {**key, "label": f"${LABEL_FIELD}"}, "count": {"$sum": 1}}}]
+    for row in raw.aggregate(label_pipeline, allowDiskUse=True):
+        label = row["_id"].pop("label", None)
+        if label is not None:
+            labels.setdefault(_series_key(row["_id"]), {})[str(label)] = row["count"]
+
+    percentiles = {}
+    rows = list(raw.aggregate([match, {"$group": group}], allowDiskUse=True))
+    for row in rows:
+        percentiles[_series_key(row["_id"])] = {
+            metric: _p95_value(row[f"p95_{i}"], native_percentile) for i, metric in enumerate(metrics)
+        }
+    return _write_rollups(db, source, tier, rows, percentiles, labels)
+
+
+def rollup_from_finest(db, source, tier, start, end, native_percentile=False):
+    """
+    Summarise [start, end) into a coarser tier from the documents of the finest
+    tier, which must already cover the window. Count, sum, min and max are
+    combined exactly; p95 is computed from one pass over the raw rows.
+
+    Args:
+        db: pymongo Database
+        source (str): Raw collection, e.g. "pod_metrics"
+        tier (str): Key of ROLLUP_TIERS other than FINEST_TIER
+        start (datetime): First bucket start (UTC)
+        end (datetime): End of the last bucket (UTC)
+        native_percentile (bool): Let MongoDB compute p95 with $percentile
+
+    Returns:
+        int: Rollup documents written
+    """
+    bucket_seconds = ROLLUP_TIERS[tier]
+    metrics = ROLLUP_SOURCES[source]
+    finest = db[rollup_collection_name(source, FINEST_TIER)]
+    match = {"$match": {"timestamp": {"$gte": start, "$lt": end}}}
+    key = {"meta": f"${META_FIELD}", "t": bucket_start(bucket_seconds)}
+
+    group = {"_id": key, "count": {"$sum": "$count"}}
+    for i, metric in enumerate(metrics):
+        field = f"$metrics.{metric}"
+        group[f"sum_{i}"] = {"$sum": f"{field}.sum"}
+        group[f"n_{i}"] = {"$sum": f"{field}.n"}
+        group[f"min_{i}"] = {"$min": f"{field}.min"}
+        group[f"max_{i}"] = {"$max": f"{field}.max"}
+
+    labels = {}
+    label_pipeline = [
+        match,
+        {"$project": {"timestamp": 1, META_FIELD: 1, "labels": {"$objectToArray": "$labels"}}},
+        {"$unwind": "$labels"},
+        {"$group": {"_id": {**key, "label": "$labels.k"}, "count": {"$sum": "$labels.v"}}},
+    ]
+    for row in finest.aggregate(label_pipeline, allowDiskUse=True):
+        label = row["_id"].pop("label")
+        labels.setdefault(_series_key(row["_id"]), {})[label] = row["count"]
+
+    rows = list(finest.aggregate([match, {"$group": group}], allowDiskUse=True))
+    percentiles = raw_percentiles(db, source, start, end, bucket_seconds, native_percentile) if rows else {}
+    return _write_rollups(db, source, tier, rows, percentiles, labels)
+
+
+def raw_percentiles(db, source, start, end, bucket_seconds, native_percentile=False):
+    """
+    p95 of every metric per series and bucket of the raw rows in [start, end).
+
+    Returns:
+        dict: {(meta items, bucket start): {metric: p95}}
+    """
+    metrics = ROLLUP_SOURCES[source]
+    group = {"_id": {"meta": f"${META_FIELD}", "t": bucket_start(bucket_seconds)}}
+    for i, metric in enumerate(metrics):
+        group[f"p95_{i}"] = _p95_accumulator(f"${metric}", native_percentile)
+    pipeline = [{"$match": {"timestamp": {"$gte": start, "$lt": end}}}, {"$group": group}]
+
+    percentiles = {}
+    for row in db[source].aggregate(pipeline, allowDiskUse=True):
+        percentiles[_series_key(row["_id"])] = {
+            metric: _p95_value(row[f"p95_{i}"], native_percentile) for i, metric in enumerate(metrics)
+        }
+    return percentiles
+
+
+def _p95_accumulator(field, native_percentile):
+    if native_percentile:
+        return {"$percentile": {"input": field, "p": [0.95], "method": "approximate"}}
+    return {"$push": field}
+
+
+def _p95_value(value, native_percentile):
+    if native_percentile:
+        return value[0] if value else None
+    numbers = [item for item in value if isinstance(item, (int, float)) and not isinstance(item, bool)]
+    return float(np.percentile(numbers, 95)) if numbers else None
+
+
+def _write_rollups(db, source, tier, rows, percentiles, labels):
+    """Replace the rollup documents of the grouped rows; returns how many were written."""
+    metrics = ROLLUP_SOURCES[source]
+    requests = []
+    for row in rows:
+        series = _series_key(row["_id"])
+        values = {}
+        for i, metric in enumerate(metrics):
+            if not row[f"n_{i}"]:
+                continue
+            values[metric] = {
+                "sum": row[f"sum_{i}"], "n": row[f"n_{i}"],
+                "min": row[f"min_{i}"], "max": row[f"max_{i}"],
+                "p95": percentiles.get(series, {}).get(metric),
+            }
+        doc = {
+            "_id": row["_id"],
+            "timestamp": row["_id"]["t"],
+            META_FIELD: row["_id"]["meta"],
+            "count": row["count"],
+            "metrics": values,
+            "labels": labels.get(series, {}),
+        }
+        requests.append(ReplaceOne({"_id": doc["_id"]}, doc, upsert=True))
+
+    if requests:
+        db[rollup_collection_name(source, tier)].bulk_write(requests, ordered=False)
+    return len(requests)
+
+
+def _series_key(key):
+    meta = key.get("meta") or {}
+    return tuple(sorted(meta.items())), as_utc(key["t"])
+
+
+def provision_rollup_collections(db, retention_days=ROLLUP_RETENTION_DAYS):
+    """
+    Create the dashboard indexes and the retention TTL of every rollup collection.
+
+    Args:
+        db: pymongo Database
+        retention_days (dict): Days kept per tier, 0 keeps them forever
+    """
+    for source in ROLLUP_SOURCES:
+        for tier in ROLLUP_TIERS:
+            collection = db[rollup_collection_name(source, tier)]
+            for keys in METRICS_INDEXES[source]:
+                collection.create_index(keys)
+            ttl_seconds = int(retention_days.get(tier, 0) * 86400)
+            ttl_index = collection.index_information().get("timestamp_ttl")
+            if ttl_index is not None and ttl_index.get("expireAfterSeconds") != (ttl_seconds or None):
+                collection.drop_index("timestamp_ttl")
+            if ttl_seconds:
+                collection.create_index([("timestamp", ASCENDING)], name="timestamp_ttl", expireAfterSeconds=ttl_seconds)
+            else:
+                collection.create_index([("timestamp", ASCENDING)], name="timestamp_ttl")
+
+
+class RollupCompactor:
+    """
+    Keeps the rollup tiers up to date in a background thread.
+
+    Every ``interval`` seconds, the finest tier is extended over the buckets
+    that closed at least ``lag`` seconds ago and that hold no row still
+    waiting to be written, and each coarser tier over the buckets the finest
+    tier fully covers. Over the last ``rewind`` seconds before that point,
+    the raw rows are counted per finest bucket; buckets whose count changed
+    since they were summarised received late rows and are rolled up again in
+    every tier.
+
+    Args:
+        db: pymongo Database holding the raw metrics collections
+        interval (float): Seconds between two runs
+        lag (float): Seconds a bucket must be closed before it is rolled up
+        rewind (float): Seconds of already summarised buckets checked for late rows each run
+        pending_since (callable): Returns the UTC timestamp of the oldest row not yet
+            written (e.g. WriteBehindMongoExporter.oldest_pending), or None
+    """
+
+    def __init__(self, db, interval=ROLLUP_INTERVAL, lag=ROLLUP_LAG, rewind=ROLLUP_REWIND, pending_since=None):
+        self.db = db
+        self.interval = interval
+        self.lag = lag
+        self.rewind = rewind
+        self.pending_since = pending_since
+        self._native_percentile = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self, now=None):
+        """
+        Roll up every closed bucket not yet written.
+
+        Returns:
+            dict: Rollup documents written per rollup collection
+        """
+        if self._native_percentile is None:
+            self._native_percentile = server_has_percentile(self.db)
+        now = now or datetime.now(timezone.utc)
+        pending = self.pending_since() if self.pending_since is not None else None
+        written = {}
+        for source in ROLLUP_SOURCES:
+            late = self._roll_up_finest(source, now, pending, written)
+            for tier in list(ROLLUP_TIERS)[1:]:
+                self._roll_up_coarser(source, tier, late, written)
+        return written
+
+    def _roll_up_finest(self, source, now, pending, written):
+        """Extend the finest tier from the raw rows; returns the bucket starts that got late rows."""
+        bucket_seconds = ROLLUP_TIERS[FINEST_TIER]
+        name = rollup_collection_name(source, FINEST_TIER)
+        end = floor_time(now - timedelta(seconds=self.lag), bucket_seconds)
+        if pending is not None:
+            # Buckets with rows still queued (e.g. during a MongoDB outage) wait for them
+            end = min(end, floor_time(pending, bucket_seconds))
+        until = rolled_up_until(self.db, source, FINEST_TIER)
+        written[name] = 0
+        late = []
+        if until is None:
+            start = self._first_bucket(source, bucket_seconds)
+        else:
+            if end < until:
+                self._set_until(name, end)
+            start = min(until, end)
+            late = self._late_buckets(source, floor_time(start - timedelta(seconds=self.rewind), bucket_seconds), start)
+            for bucket in late:
+                written[name] += rollup_window(
+                    self.db, source, FINEST_TIER, bucket, bucket + timedelta(seconds=bucket_seconds),
+                    self._native_percentile
+                )
+        written[name] += self._extend(source, FINEST_TIER, start, end, rollup_window)
+        return late
+
+    def _roll_up_coarser(self, source, tier, late, written):
+        """Extend a coarser tier over the buckets the finest tier covers and redo those that got late rows."""
+        bucket_seconds = ROLLUP_TIERS[tier]
+        name = rollup_collection_name(source, tier)
+        written[name] = 0
+        finest_until = rolled_up_until(self.db, source, FINEST_TIER)
+        if finest_until is None:
+            return
+        end = floor_time(finest_until, bucket_seconds)
+        until = rolled_up_until(self.db, source, tier)
+        if until is None:
+            start = self._first_bucket(source, bucket_seconds)
+        else:
+            if end < until:
+                self._set_until(name, end)
+            start = min(until, end)
+            for bucket in sorted({floor_time(minute, bucket_seconds) for minute in late}):
+                if bucket < start:
+                    written[name] += rollup_from_finest(
+                        self.db, source, tier, bucket, bucket + timedelta(seconds=bucket_seconds),
+                        self._native_percentile
+                    )
+        written[name] += self._extend(source, tier, start, end, rollup_from_finest)
+
+    def _extend(self, source, tier, start, end, rollup):
+        """Roll up [start, end) chunk by chunk, saving the progress after each chunk."""
+        bucket_seconds = ROLLUP_TIERS[tier]
+        written = 0
+        while start is not None and start < end and not self._stop.is_set():
+            chunk_end = min(end, start + timedelta(seconds=bucket_seconds * CHUNK_BUCKETS))
+            written += rollup(self.db, source, tier, start, chunk_end, self._native_percentile)
+            self._set_until(rollup_collection_name(source, tier), chunk_end)
+            start = chunk_end
+        return written
+
+    def _late_buckets(self, source, start, end):
+        """
+        Finest buckets of [start, end) whose raw row count differs from the
+        count they were summarised with. Only the rows are counted, so this
+        is far cheaper than rolling the window up again.
+        """
+        if start >= end:
+            return []
+        bucket_seconds = ROLLUP_TIERS[FINEST_TIER]
+        match = {"$match": {"timestamp": {"$gte": start, "$lt": end}}}
+        raw_counts = self.db[source].aggregate(
+            [match, {"$group": {"_id": bucket_start(bucket_seconds), "count": {"$sum": 1}}}], allowDiskUse=True
+        )
+        rolled_counts = self.db[rollup_collection_name(source, FINEST_TIER)].aggregate(
+            [match, {"$group": {"_id": "$timestamp", "count": {"$sum": "$count"}}}]
+        )
+        rolled = {as_utc(row["_id"]): row["count"] for row in rolled_counts}
+        return sorted(
+            as_utc(row["_id"]) for row in raw_counts if row["count"] != rolled.get(as_utc(row["_id"]))
+        )
+
+    def _set_until(self, name, until):
+        self.db[ROLLUP_STATE].update_one({"_id": name}, {"$set": {"until": until}}, upsert=True)
+
+    def start(self):
+        """Provision the rollup collections and run the compactor in a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        try:
+            provision_rollup_collections(self.db)
+        except PyMongoError as e:
+            print(f"Could not provision rollup collections: {e}")
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="rollup-compactor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                self.run_once()
+            except PyMongoError as e:
+                # Picked up again from the saved state on the next run
+                print(f"Error rolling up metrics: {e}")
+            if self._stop.wait(self.interval):
+                return
+
+    def _first_bucket(self, source, bucket_seconds):
+        oldest = self.db[source].find_one({}, {"timestamp": 1}, sort=[("timestamp", ASCENDING)])
+        if oldest is None or not isinstance(oldest.get("timestamp"), datetime):
+            return None
+        return floor_time(as_utc(oldest["timestamp"]), bucket_seconds)
@@ -2,8 +2,174 @@
 Utility functions for filtering Kubernetes events.
 """
 
+import heapq
+import json
+import os
+import time
+from collections import defaultdict
+
+from config.settings import (
+    EVENT_TTL_SECONDS, SEEN_EVENTS_MAX,
+    SEEN_EVENTS_SNAPSHOT, SEEN_EVENTS_SNAPSHOT_INTERVAL
+)
+
+
+class SeenEventStore:
+    """
+    Bounded store of seen event UIDs that forgets events once they have expired.
+    
+    Each UID expires ``ttl_seconds`` after its event's last timestamp, i.e. once
+    the API server can no longer return it; an event still being returned is
+    kept until it stops appearing. Beyond ``max_size`` UIDs the soonest to
+    expire are dropped first. When a ``snapshot_path`` is given the store is
+    loaded from it on creation and saved to it at most every
+    ``snapshot_interval`` seconds, so a restart does not replay every event
+    still in the cluster.
+    
+    Args:
+        ttl_seconds (int): Seconds an event is kept after its last timestamp
+        max_size (int): Maximum number of UIDs to keep
+        snapshot_path (str): Optional JSON file to persist the store to
+        snapshot_interval (int): Minimum seconds between snapshots
+    """
+    
+    def __init__(self, ttl_seconds=EVENT_TTL_SECONDS, max_size=SEEN_EVENTS_MAX,
+                 snapshot_path=None, snapshot_interval=SEEN_EVENTS_SNAPSHOT_INTERVAL):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._expiry = {}
+        self._heap = []
+        self._dirty = False
+        self._last_snapshot = 0.0
+        if snapshot_path:
+            self.load()
+    
+    def __contains__(self, uid):
+        return uid in self._expiry
+    
+    def __len__(self):
+        return len(self._expiry)
+    
+    def add(self, event, now=None):
+        """
+        Record an event as seen, or extend its expiry if it was updated.
+        
+        Args:
+            event: Kubernetes event object
+            now (float): Current time in epoch seconds
+        """
+        now = time.time() if now is None else now
+        self._set(event.metadata.uid, max(self._event_time(event) + self.ttl_seconds, now))
+        while len(self._expiry) > self.max_size:
+            self._pop()
+    
+    def expire(self, now=None):
+        """Drop UIDs whose events have expired from the API server."""
+        now = time.time() if now is None else now
+        while self._heap and self._heap[0][0] < now:
+            self._pop()
+    
+    def load(self):
+        """Load UIDs that have not expired yet from the snapshot file."""
+        try:
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            print(f"Error loading seen events snapshot: {e}")
+            return
+        for uid, expires_at in snapshot.items():
+            self._set(uid, expires_at)
+        self.expire()
+        while len(self._expiry) > self.max_size:
+            self._pop()
+        self._dirty = False
+    
+    def save(self, force=False):
+        """Write the store to the snapshot file if it changed since the last snapshot."""
+        if not self.snapshot_path or not self._dirty:
+            return
+        if not force and time.time() - self._last_snapshot < self.snapshot_interval:
+            return
+        tmp_path = f"{self.snapshot_path}.tmp"
+        try:
+            with open(tmp_path, "w") as f:
+                json.dump(self._expiry, f, separators=(",", ":"))
+            os.replace(tmp_path, self.snapshot_path)
+            self._dirty = False
+            self._last_snapshot = time.time()
+        except OSError as e:
+            print(f"Error saving seen events snapshot: {e}")
+    
+    def _set(self, uid, expires_at):
+        if self._expiry.get(uid, float("-inf")) >= expires_at:
+            return
+        self._expiry[uid] = expires_at
+        heapq.heappush(self._heap, (expires_at, uid))
+        self._dirty = True
+        # Drop superseded heap entries once they outnumber live ones
+        if len(self._heap) > 2 * len(self._expiry) + 1024:
+            self._heap = [(expires_at, uid) for uid, expires_at in self._expiry.items()]
+            heapq.heapify(self._heap)
+    
+    def _pop(self):
+        expires_at, uid = heapq.heappop(self._heap)
+        if self._expiry.get(uid) == expires_at:
+            del self._expiry[uid]
+            self._dirty = True
+    
+    @staticmethod
+    def _event_time(event):
+        for timestamp in (getattr(event, "last_timestamp", None),
+                          getattr(event, "event_time", None),
+                          event.metadata.creation_timestamp):
+            if timestamp is not None:
+                return timestamp.timestamp()
+        return time.time()
+
+
 # Store seen event UIDs to track new events
-seen_event_uids = set()
+seen_events = SeenEventStore(snapshot_path=SEEN_EVENTS_SNAPSHOT or None)
+
+
+class EventIndex:
+    """
+    Events grouped by their involved object, built once per cycle.
+    
+    Lookups by (kind, namespace, name) are O(1). Cluster-scoped objects such as
+    nodes can also be looked up by (kind, name) regardless of the namespace the
+    event was recorded in. The filter_events_for_* functions accept an index in
+    place of an event list.
+    
+    Args:
+        events (list): List of events
+    """
+    
+    def __init__(self, events):
+        self.events = list(events)
+        self._by_object = defaultdict(list)
+        self._by_name = defaultdict(list)
+        for event in self.events:
+            obj = event.involved_object
+            self._by_object[(obj.kind, obj.namespace, obj.name)].append(event)
+            self._by_name[(obj.kind, obj.name)].append(event)
+    
+    def __iter__(self):
+        return iter(self.events)
+    
+    def __len__(self):
+        return len(self.events)
+    
+    def for_object(self, kind, namespace, name):
+        """Return events whose involved object matches kind, namespace and name."""
+        return list(self._by_object.get((kind, namespace, name), ()))
+    
+    def for_name(self, kind, name):
+        """Return events whose involved object matches kind and name in any namespace."""
+        return list(self._by_name.get((kind, name), ()))
 
 
 def get_new_events(all_events):
@@ -16,13 +182,16 @@ def get_new_events(all_events):
     Returns:
         list: List of new events not seen before
     """
-    global seen_event_uids
+    now = time.time()
     new_events = []
     
     for event in all_events:
-        if event.metadata.uid not in seen_event_uids:
-            seen_event_uids.add(event.metadata.uid)
+        if event.metadata.uid not in seen_events:
             new_events.append(event)
+        seen_events.add(event, now)
+    
+    seen_events.expire(now)
+    seen_events.save()
             
     return new_events
 
@@ -32,12 +201,14 @@ def filter_events_for_node(events, node_name):
     Filter events related to a specific node.
     
     Args:
-        events (list): List of events
+        events (list or EventIndex): List of events or an index of them
         node_name (str): Name of the node
         
     Returns:
         list: Filtered list of events related to the node
     """
+    if isinstance(events, EventIndex):
+        return events.for_name("Node", node_name)
     node_related_events = []
     for event in events:
         obj = event.involved_object
@@ -51,13 +222,15 @@ def filter_events_for_pod(events, namespace, pod_name):
     Filter events related to a specific pod.
     
     Args:
-        events (list): List of events
+        events (list or EventIndex): List of events or an index of them
         namespace (str): Namespace of the pod
         pod_name (str): Name of the pod
         
     Returns:
         list: Filtered list of events related to the pod
     """
+    if isinstance(events, EventIndex):
+        return events.for_object("Pod", namespace, pod_name)
     pod_related_events = []
     for event in events:
         obj = event.involved_object
@@ -73,13 +246,15 @@ def filter_events_for_deployment(events, namespace, deployment_name):
     Filter events related to a specific deployment.
     
     Args:
-        events (list): List of events
+        events (list or EventIndex): List of events or an index of them
         namespace (str): Namespace of the deployment
         deployment_name (str): Name of the deployment
         
     Returns:
         list: Filtered list of events related to the deployment
     """
+    if isinstance(events, EventIndex):
+        return events.for_object("Deployment", namespace, deployment_name)
     deployment_related_events = []
     for event in events:
         obj = event.involved_object
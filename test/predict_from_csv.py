@@ -8,6 +8,8 @@ from sklearn.metrics import classification_report
 import argparse
 import os
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
 # Conditional import
 try:
     from tensorflow.keras.models import load_model as load_keras_model
@@ -36,6 +38,17 @@ def load_models(model_type):
         sys.exit(1)
 
 
+def load_data(path, feature_cols, start=None, end=None):
+    """Load a metrics CSV, or only the needed columns and time range of a Parquet dataset"""
+    if os.path.isdir(path) or str(path).endswith(".parquet"):
+        from storage.parquet_exporter import read_metrics
+        columns = feature_cols + ['timestamp', 'pod', 'label', 'status_label']
+        df = read_metrics(path, columns=columns, start=start, end=end)
+        # Columns absent from the dataset are filled like missing CSV columns
+        return df.dropna(axis=1, how='all')
+    return pd.read_csv(path)
+
+
 def prepare_data(df, feature_cols):
     """Prepare and validate input data"""
     for col in feature_cols:
@@ -53,10 +66,12 @@ def prepare_data(df, feature_cols):
 
 def main():
     parser = argparse.ArgumentParser()
-    parser.add_argument("input_csv", help="Input CSV file path")
+    parser.add_argument("input_csv", help="Input CSV file path, Parquet file or Parquet dataset directory")
     parser.add_argument("--model", choices=["rf", "nn"], default="rf", help="Model type to use: 'rf' or 'nn'")
     parser.add_argument("--no-labels", action="store_true", help="Specify if input has no labels")
     parser.add_argument("--output", help="Optional output CSV file path")
+    parser.add_argument("--start", help="Parquet input only: earliest timestamp to read")
+    parser.add_argument("--end", help="Parquet input only: timestamp to read up to (exclusive)")
     args = parser.parse_args()
 
     feature_cols = [
@@ -75,7 +90,7 @@ def main():
     model, scaler, label_encoder = load_models(args.model)
 
     try:
-        df = pd.read_csv(args.input_csv)
+        df = load_data(args.input_csv, feature_cols, args.start, args.end)
         X = prepare_data(df, feature_cols)
 
         if not args.no_labels:
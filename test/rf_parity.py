@@ -0,0 +1,107 @@
+"""
+Parity and latency check of the compiled Random Forest (MODEL_TYPE=rf_compiled)
+against the pickled scikit-learn model.
+
+Usage:
+    python3 test/rf_parity.py data/k8s_chaos_data_test.csv
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BASE_DIR / "src"))
+
+from predictor.forest import CompiledForest
+from predictor.predictor import FEATURE_COLS_PODS
+
+
+def prepare_data(df, feature_cols):
+    """Prepare features the same way as test/predict_from_csv.py"""
+    df = df.copy()
+    for col in feature_cols:
+        if col not in df.columns:
+            df[col] = 0.0
+
+    if 'timestamp' in df.columns and 'pod' in df.columns:
+        df['timestamp'] = pd.to_datetime(df['timestamp'])
+        df['time_since_pod_start'] = df.groupby('pod')['timestamp'].transform(
+            lambda x: (x - x.min()).dt.total_seconds())
+
+    return df[feature_cols]
+
+
+def time_per_call(predict, X, batch_size, repeat):
+    """Median seconds per predict call over batches of the given size"""
+    batches = [X[i:i + batch_size] for i in range(0, len(X), batch_size)][:repeat]
+    timings = []
+    for batch in batches:
+        start = time.perf_counter()
+        predict(batch)
+        timings.append(time.perf_counter() - start)
+    return float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("input_csv", nargs="?", default=str(BASE_DIR / "data" / "k8s_chaos_data_test.csv"),
+                        help="Input CSV file path")
+    parser.add_argument("--models-dir", default=str(BASE_DIR / "models"), help="Directory with model artifacts")
+    parser.add_argument("--tolerance", type=float, default=1e-9, help="Maximum allowed probability difference")
+    parser.add_argument("--repeat", type=int, default=50, help="Number of batches timed per batch size")
+    args = parser.parse_args()
+
+    models_dir = Path(args.models_dir)
+    model = joblib.load(models_dir / "random_forest_model.pkl")
+    scaler = joblib.load(models_dir / "scaler_rf.pkl")
+    label_encoder = joblib.load(models_dir / "label_encoder.pkl")
+
+    compiled_path = models_dir / "random_forest_model.npz"
+    if compiled_path.exists():
+        compiled = CompiledForest.load(compiled_path)
+    else:
+        print(f"{compiled_path.name} not found, compiling in memory")
+        compiled = CompiledForest.from_sklearn(model)
+
+    df = pd.read_csv(args.input_csv)
+    X_scaled = np.nan_to_num(scaler.transform(prepare_data(df, FEATURE_COLS_PODS)), nan=0)
+
+    # --- Parity ---
+    expected_proba = model.predict_proba(X_scaled)
+    actual_proba = compiled.predict_proba(X_scaled)
+    expected_labels = label_encoder.inverse_transform(model.predict(X_scaled))
+    actual_labels = label_encoder.inverse_transform(compiled.predict(X_scaled))
+
+    max_diff = float(np.abs(expected_proba - actual_proba).max())
+    label_mismatches = int((expected_labels != actual_labels).sum())
+
+    print(f"Rows compared: {len(X_scaled)}")
+    for i, cls in enumerate(label_encoder.classes_):
+        diff = float(np.abs(expected_proba[:, i] - actual_proba[:, i]).max())
+        print(f"  prob_{cls}: max abs difference {diff:.3e}")
+    print(f"  predicted_label mismatches: {label_mismatches}")
+
+    # --- Latency ---
+    print("\nMedian latency per call (sklearn predict + predict_proba vs compiled predict_proba):")
+    for batch_size in (1, 32, len(X_scaled)):
+        sklearn_seconds = time_per_call(lambda b: (model.predict(b), model.predict_proba(b)),
+                                        X_scaled, batch_size, args.repeat)
+        compiled_seconds = time_per_call(compiled.predict_proba, X_scaled, batch_size, args.repeat)
+        print(f"  batch {batch_size:>5}: sklearn {sklearn_seconds * 1e3:8.3f} ms | "
+              f"compiled {compiled_seconds * 1e3:8.3f} ms | "
+              f"speedup {sklearn_seconds / compiled_seconds:6.1f}x")
+
+    if label_mismatches or max_diff > args.tolerance:
+        print("\nParity check FAILED")
+        sys.exit(1)
+    print("\nParity check passed")
+
+
+if __name__ == "__main__":
+    main()